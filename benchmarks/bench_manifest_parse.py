@@ -0,0 +1,56 @@
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import generate_manifest  # noqa: E402
+
+PARSERS = ("from_lua_str", "from_lua_runtime")
+
+
+def run_parser(parser: str, manifest_path: str, rounds: int):
+    from rocks.lua import get_sandbox
+    from rocks.manifest import Manifest
+
+    with open(manifest_path, "rb") as manifest_file:
+        content = manifest_file.read()
+
+    get_sandbox()
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        manifest = getattr(Manifest, parser)(content)
+        timings.append(time.perf_counter() - started)
+        del manifest
+
+    print(json.dumps({
+        "parser": parser,
+        "best": min(timings),
+        "mean": sum(timings) / len(timings),
+        "peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base_rss,
+    }))
+
+
+def main(packages: int = 5000, rounds: int = 5):
+    with tempfile.NamedTemporaryFile("w", suffix=".manifest", delete=False) as manifest_file:
+        manifest_file.write(generate_manifest(packages))
+
+    try:
+        for parser in PARSERS:
+            subprocess.run([sys.executable, __file__, "--run", parser, manifest_file.name, str(rounds)], check=True)
+    finally:
+        os.remove(manifest_file.name)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        run_parser(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+    else:
+        main(*map(int, sys.argv[1:]))
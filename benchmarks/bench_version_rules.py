@@ -0,0 +1,45 @@
+import json
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import package_versions  # noqa: E402
+from rocks.manifest import Manifest  # noqa: E402
+
+OPERATORS = ("==", "<", "<=", ">", ">=", "~>")
+
+
+def build_package(versions: int, seed: int = 0):
+    rnd = random.Random(seed)
+    names = set()
+    while len(names) < versions:
+        names.update(package_versions(rnd, max_versions=versions))
+    repository = [("bench", [(name, ["rockspec"]) for name in sorted(names)[:versions]])]
+    return Manifest.from_arches({}, {}, repository).packages[0]
+
+
+def main(versions: int = 200, number: int = 20000):
+    package = build_package(versions)
+    queries = [version.name for version in package.semver_versions[::max(1, len(package.semver_versions) // 16)]]
+    queries += ["0.1", "1.0", "2.3.4", "scm-1"]
+
+    for operator in OPERATORS:
+        def run():
+            for query in queries:
+                package.get_version_by_rule(operator, query)
+
+        seconds = min(timeit.repeat(run, number=number // len(queries), repeat=5))
+        print(json.dumps({
+            "benchmark": "get_version_by_rule",
+            "operator": operator,
+            "versions": versions,
+            "usec_per_call": seconds / (number // len(queries) * len(queries)) * 1e6,
+        }))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
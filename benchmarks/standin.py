@@ -0,0 +1,53 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, directory: str, latency: float = 0.0):
+        super().__init__(("127.0.0.1", 0), functools.partial(_Handler, directory=directory))
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def address(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.count()
+        time.sleep(self.server.latency)
+        super().do_GET()
+
+    def do_HEAD(self):
+        self.server.count()
+        time.sleep(self.server.latency)
+        super().do_HEAD()
+
+
+@contextmanager
+def serve(directory: str, latency: float = 0.0) -> Iterator[StandInServer]:
+    server = StandInServer(directory, latency)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
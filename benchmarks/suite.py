@@ -0,0 +1,271 @@
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Optional
+
+import click
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_version_rules import OPERATORS, build_package  # noqa: E402
+from benchmarks.standin import serve  # noqa: E402
+from benchmarks.synthetic import generate_graph, generate_manifest, package_name  # noqa: E402
+from rocks.manifest import Manifest  # noqa: E402
+from rocks.rockspec import Rockspec  # noqa: E402
+from rocks.search import SearchIndex  # noqa: E402
+from rocks.server import RockServer  # noqa: E402
+from rocks.tree import DepTree  # noqa: E402
+
+
+def measure(func: Callable[[], None], rounds: int, number: int = 1) -> dict:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number)
+    return {"best": min(timings), "mean": sum(timings) / len(timings), "rounds": rounds, "number": number}
+
+
+def bench_parse(sizes: list[int], rounds: int) -> list[dict]:
+    results = []
+    for size in sizes:
+        content = generate_manifest(size).encode("utf-8")
+        results.append({
+            "benchmark": "Manifest.from_lua_str",
+            "params": {"packages": size, "bytes": len(content)},
+            **measure(lambda: Manifest.from_lua_str(content), rounds),
+        })
+    return results
+
+
+def bench_search(sizes: list[int], rounds: int) -> list[dict]:
+    results = []
+    for size in sizes:
+        man = Manifest.from_lua_str(generate_manifest(size))
+        rnd = random.Random(0)
+        names = [package_name(rnd.randrange(size)) for _ in range(1000)] + [f"missing-{i}" for i in range(100)]
+
+        def run():
+            for name in names:
+                man.search(name)
+
+        results.append({
+            "benchmark": "Manifest.search",
+            "params": {"packages": size, "queries": len(names)},
+            **measure(run, rounds, number=10),
+        })
+
+        results.append({
+            "benchmark": "SearchIndex.from_names",
+            "params": {"packages": size},
+            **measure(lambda: SearchIndex.from_names(package.name for package in man.packages), rounds),
+        })
+
+        index = man.search_index
+        typos = [name[:2] + name[3:] for name in names[:100]]
+        for kind, queries, query in (
+                ("prefix", [name[:-1] + "*" for name in names[:100]], index.glob),
+                ("glob", ["*" + name[1:5] + "*" for name in names[:100]], index.glob),
+                ("fuzzy", typos, index.fuzzy),
+        ):
+            def run_queries():
+                for pattern in queries:
+                    query(pattern)
+
+            results.append({
+                "benchmark": "SearchIndex." + kind,
+                "params": {"packages": size, "queries": len(queries)},
+                **measure(run_queries, rounds),
+            })
+    return results
+
+
+def bench_version_rules(rounds: int) -> list[dict]:
+    results = []
+    for versions in (10, 200):
+        package = build_package(versions)
+        queries = [version.name for version in package.semver_versions[::max(1, len(package.semver_versions) // 16)]]
+        queries += ["0.1", "1.0", "2.3.4", "scm-1"]
+        for operator in OPERATORS:
+            def run():
+                for query in queries:
+                    package.get_version_by_rule(operator, query)
+
+            results.append({
+                "benchmark": "Package.get_version_by_rule",
+                "params": {"versions": versions, "operator": operator, "queries": len(queries)},
+                **measure(run, rounds, number=200),
+            })
+    return results
+
+
+def bench_rockspec(rounds: int) -> list[dict]:
+    files = generate_graph(depth=3, fanout=4)
+    contents = [content.decode("utf-8") for name, content in sorted(files.items()) if name.endswith(".rockspec")]
+
+    def run():
+        for content in contents:
+            Rockspec.from_string(content)
+
+    return [{
+        "benchmark": "Rockspec.from_string",
+        "params": {"rockspecs": len(contents)},
+        **measure(run, rounds),
+    }]
+
+
+def bench_deptree(depth: int, fanout: int, latency: float, rounds: int) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        files = generate_graph(depth, fanout)
+        for name, content in files.items():
+            with open(os.path.join(directory, name), "wb") as file:
+                file.write(content)
+        root = max(name for name in files if name.startswith("root-") and name.endswith(".rockspec"))
+        spec = Rockspec.from_string(files[root].decode("utf-8"))
+
+        with serve(directory, latency) as standin:
+            for use_listing in (True, False):
+                with RockServer(standin.address) as server:
+                    man = server.get_manifest()
+                requests_before = standin.requests
+
+                def run():
+                    with RockServer(standin.address, use_listing=use_listing) as fresh:
+                        DepTree(fresh, man, ["lua"], "src").resolve(spec)
+
+                timing = measure(run, rounds)
+                results.append({
+                    "benchmark": "deptree",
+                    "params": {"depth": depth, "fanout": fanout, "latency": latency, "listing": use_listing},
+                    "requests": (standin.requests - requests_before) // rounds,
+                    **timing,
+                })
+    return results
+
+
+HEAVY_MODULES = ("requests", "urllib3", "lupa.lua52", "semver")
+STARTUP_COMMANDS = (("--help",), ("manifest", "--help"))
+
+
+def bench_startup(rounds: int) -> list[dict]:
+    results = []
+    for command in STARTUP_COMMANDS:
+        args = [sys.executable, "-X", "importtime", os.path.join(ROOT, "rocks-admin.py"), *command]
+        timings = []
+        imports = []
+        loaded = set()
+        for _ in range(rounds):
+            started = time.perf_counter()
+            finished = subprocess.run(args, capture_output=True, text=True, check=True)
+            timings.append(time.perf_counter() - started)
+
+            total = 0
+            for line in finished.stderr.splitlines():
+                if not line.startswith("import time:") or "|" not in line:
+                    continue
+                _, cumulative, name = line.split("|")
+                if cumulative.strip().isdigit() and not name.startswith("  "):
+                    total += int(cumulative)
+                loaded.add(name.strip())
+            imports.append(total / 1e6)
+
+        results.append({
+            "benchmark": "startup",
+            "params": {"command": " ".join(command)},
+            "imports": min(imports),
+            "heavy_modules": sorted(loaded.intersection(HEAVY_MODULES)),
+            "best": min(timings),
+            "mean": sum(timings) / len(timings),
+            "rounds": rounds,
+            "number": 1,
+        })
+    return results
+
+
+def _revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@click.group()
+def main():
+    pass
+
+
+@main.command()
+@click.option("--sizes", default="1000,10000,50000", show_default=True, help="manifest sizes, packages")
+@click.option("--rounds", default=3, show_default=True)
+@click.option("--depth", default=4, show_default=True, help="dependency graph depth for deptree")
+@click.option("--fanout", default=3, show_default=True, help="dependencies per rockspec for deptree")
+@click.option("--latency", default=0.02, show_default=True, help="stand-in server latency per request, seconds")
+@click.option("--output", type=click.Path(dir_okay=False), help="write results json here instead of stdout")
+def run(sizes: str, rounds: int, depth: int, fanout: int, latency: float, output: Optional[str]):
+    manifest_sizes = [int(size) for size in sizes.split(",")]
+    results = []
+    for name, bench in (
+            ("startup", lambda: bench_startup(max(rounds, 5))),
+            ("parse", lambda: bench_parse(manifest_sizes, rounds)),
+            ("search", lambda: bench_search(manifest_sizes, rounds)),
+            ("version rules", lambda: bench_version_rules(rounds)),
+            ("rockspec", lambda: bench_rockspec(rounds)),
+            ("deptree", lambda: bench_deptree(depth, fanout, latency, rounds)),
+    ):
+        click.echo(f"running {name}", err=True)
+        results.extend(bench())
+
+    report = json.dumps({
+        "revision": _revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }, indent=2)
+    if output is None:
+        click.echo(report)
+    else:
+        with open(output, "w") as report_file:
+            report_file.write(report + "\n")
+
+
+def _key(result: dict) -> str:
+    return result["benchmark"] + " " + " ".join(f"{k}={v}" for k, v in sorted(result["params"].items()))
+
+
+@main.command()
+@click.argument("base", type=click.File())
+@click.argument("new", type=click.File())
+@click.option("--threshold", default=0.1, show_default=True, help="relative change reported as a regression")
+def compare(base, new, threshold: float):
+    base_results = {_key(result): result for result in json.load(base)["results"]}
+    regressions = 0
+    for result in json.load(new)["results"]:
+        key = _key(result)
+        if key not in base_results:
+            click.echo(f"{key}: {result['best'] * 1e3:.3f} ms (new)")
+            continue
+
+        before = base_results[key]["best"]
+        change = result["best"] / before - 1 if before else 0.0
+        mark = ""
+        if change > threshold:
+            mark = " REGRESSION"
+            regressions += 1
+        click.echo(f"{key}: {before * 1e3:.3f} -> {result['best'] * 1e3:.3f} ms ({change:+.1%}){mark}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
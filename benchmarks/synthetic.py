@@ -0,0 +1,83 @@
+import random
+
+ARCHES = ("rockspec", "src", "all", "linux-x86_64", "macosx-x86_64")
+
+
+def package_versions(rnd: random.Random, max_versions: int = 6) -> list[str]:
+    versions = set()
+    if rnd.random() < 0.6:
+        versions.add(f"scm-{rnd.randint(1, 3)}")
+    if rnd.random() < 0.1:
+        versions.add("dev-1")
+    for _ in range(rnd.randint(1, max_versions)):
+        if rnd.random() < 0.15:
+            versions.add(f"{rnd.randint(0, 5)}.{rnd.randint(0, 20)}-{rnd.randint(1, 3)}")
+        else:
+            versions.add(f"{rnd.randint(0, 5)}.{rnd.randint(0, 20)}.{rnd.randint(0, 30)}-{rnd.randint(1, 3)}")
+    return sorted(versions)
+
+
+def package_name(position: int) -> str:
+    return f"package-{position:05d}" if position % 3 else f"lib{position}"
+
+
+def generate_manifest(packages: int, seed: int = 0) -> str:
+    rnd = random.Random(seed)
+    modules = []
+    repository = []
+    for position in range(packages):
+        name = package_name(position)
+        key = f'["{name}"]' if "-" in name else name
+        versions = package_versions(rnd)
+        modules.append(f'   {key} = {{\n      "{name}/{versions[-1]}"\n   }},')
+
+        blocks = []
+        for version in versions:
+            arches = ["rockspec"] + rnd.sample(ARCHES[1:], rnd.randint(0, 2))
+            entries = "\n".join(f'         {{\n            arch = "{arch}"\n         }},' for arch in arches)
+            blocks.append(f'      ["{version}"] = {{\n{entries}\n      }},')
+        repository.append(f"   {key} = {{\n" + "\n".join(blocks) + "\n   },")
+
+    return "\n".join((
+        "commands = {}",
+        "modules = {", *modules, "}",
+        "repository = {", *repository, "}",
+        "",
+    ))
+
+
+RULES = (">= 0.1", ">= 0.1", "< 9.0", ">= 1.0, < 6.0", "< 4.0", "~= 0.0.0", "~> 2")
+
+
+def _rockspec(name: str, version: str, dependencies: list[str]) -> str:
+    rules = "".join(f'   "{rule}",\n' for rule in dependencies)
+    return (
+        f'package = "{name}"\n'
+        f'version = "{version}"\n'
+        f'source = {{\n   url = "git+https://example.com/{name}.git",\n   tag = "{version}"\n}}\n'
+        f'dependencies = {{\n   "lua >= 5.1",\n{rules}}}\n'
+        f'build = {{\n   type = "builtin",\n   modules = {{\n      ["{name}"] = "{name}.lua"\n   }}\n}}\n'
+    )
+
+
+def generate_graph(depth: int, fanout: int, width: int = 0, seed: int = 0) -> dict[str, bytes]:
+    rnd = random.Random(seed)
+    width = width or fanout * 2
+    levels = [["root"]] + [[f"dep-{level}-{position}" for position in range(width)] for level in range(1, depth + 1)]
+
+    files = {}
+    repository = []
+    for level, names in enumerate(levels):
+        for name in names:
+            versions = package_versions(rnd, max_versions=4)
+            for version in versions:
+                children = rnd.sample(levels[level + 1], min(fanout, width)) if level < depth else []
+                files[f"{name}-{version}.rockspec"] = _rockspec(
+                    name, version, [f"{child} {rnd.choice(RULES)}" for child in children],
+                ).encode("utf-8")
+                files[f"{name}-{version}.src.rock"] = b"rock"
+            repository.append((name, [(version, ["rockspec", "src"]) for version in versions]))
+
+    from rocks.manifest import Manifest
+    files["manifest"] = Manifest.from_arches({}, {}, repository).to_lua_str().encode("utf-8")
+    return files
@@ -1,95 +1,217 @@
-import difflib
-from copy import copy
+from __future__ import annotations
+
+import json
 from os import path
+from typing import TYPE_CHECKING, Callable, Optional
 
 import click
 
 
-from rocks.errors import FileLoadError
-from rocks.manifest import Manifest
-from rocks.rockspec import Rockspec
-from rocks.server import RockServer
+from rocks import stats
+
+if TYPE_CHECKING:
+    from rocks.backend import Backend
+    from rocks.client import DaemonClient
+    from rocks.manifest import Manifest
+    from rocks.publish import PublishResult
+    from rocks.server import RockServer
 
 
 @click.group()
-@click.option('--server', help='http url of rocks server')
+@click.option('--server', help='http url of rocks server, file:// url or local directory of a rocks tree')
+@click.option('--pool-size', default=10, show_default=True, help='max kept-alive connections to the server')
+@click.option('--timeout', default=30.0, show_default=True, help='read timeout of a single request, seconds')
+@click.option('--no-gzip', is_flag=True, help='disable gzip transfer encoding')
+@click.option('--cache-dir', type=click.Path(file_okay=False), help='directory of on-disk http cache')
+@click.option('--offline', is_flag=True, help='use only cached files, never touch the server')
+@click.option('--max-age', default=300, show_default=True, help='seconds before cached manifest is revalidated')
+@click.option('--cache-size', default=256, show_default=True, help='cache size limit, MiB')
+@click.option('--lua-version', help='lua version of the per-version manifest (json/zip/plain), e.g. 5.1')
+@click.option('--no-listing', is_flag=True, help='check files with HEAD requests instead of the server index.html')
+@click.option('--progress', is_flag=True, help='report manifest download progress to stderr')
+@click.option('--stats', 'show_stats', is_flag=True, help='print per-phase timings, request and cache stats to stderr')
+@click.option('--stats-json', type=click.Path(dir_okay=False), help='write the stats report as json to this file')
+@click.option('--profile', type=click.Path(dir_okay=False), help='dump cProfile stats of the main thread to this file')
+@click.option('--socket', 'socket_path', type=click.Path(dir_okay=False),
+              help='unix socket of `serve` daemon, defaults to one per --server and --lua-version')
+@click.option('--no-daemon', is_flag=True, help='never ask a running `serve` daemon, always load the manifest')
 @click.pass_context
-def main(ctx: click.Context, server: str):
+def main(
+        ctx: click.Context,
+        server: str,
+        pool_size: int,
+        timeout: float,
+        no_gzip: bool,
+        cache_dir: Optional[str],
+        offline: bool,
+        max_age: int,
+        cache_size: int,
+        lua_version: Optional[str],
+        no_listing: bool,
+        progress: bool,
+        show_stats: bool,
+        stats_json: Optional[str],
+        profile: Optional[str],
+        socket_path: Optional[str],
+        no_daemon: bool,
+):
     ctx.ensure_object(dict)
-    ctx.obj["server"] = RockServer(server)
+    ctx.obj["progress"] = progress
+    ctx.obj["no_daemon"] = no_daemon
+    if socket_path is None:
+        from rocks.client import default_socket_path
+        socket_path = default_socket_path(server, lua_version)
+    ctx.obj["socket_path"] = socket_path
+    if show_stats or stats_json is not None:
+        collected = stats.enable()
+        ctx.call_on_close(lambda: _report_stats(collected, show_stats, stats_json))
+    if profile is not None:
+        import cProfile
+        profiler = cProfile.Profile()
+        ctx.call_on_close(lambda: profiler.dump_stats(profile))
+        ctx.call_on_close(profiler.disable)
+        profiler.enable()
+
+    def make_server() -> RockServer:
+        from rocks.cache import HttpCache
+        from rocks.server import RockServer
+        from rocks.snapshot import ManifestSnapshots
+
+        cache = None
+        snapshots = None
+        if cache_dir is not None:
+            cache = HttpCache(path.join(cache_dir, "http"), max_age=max_age, max_size=cache_size * 1024 * 1024)
+            snapshots = ManifestSnapshots(path.join(cache_dir, "snapshots"))
+
+        return RockServer(
+            server,
+            pool_size=pool_size,
+            timeout=(5.0, timeout),
+            gzip=not no_gzip,
+            cache=cache,
+            offline=offline,
+            snapshots=snapshots,
+            lua_version=lua_version,
+            use_listing=not no_listing,
+        )
+
+    ctx.obj["make_server"] = make_server
+
+
+def _server(ctx: click.Context) -> RockServer:
+    if "server" not in ctx.obj:
+        ctx.obj["server"] = ctx.find_root().with_resource(ctx.obj["make_server"]())
+    return ctx.obj["server"]
+
+
+def _daemon(ctx: click.Context) -> Optional[DaemonClient]:
+    if "daemon" not in ctx.obj:
+        from rocks.client import DaemonClient
+        ctx.obj["daemon"] = None if ctx.obj["no_daemon"] else DaemonClient.connect(ctx.obj["socket_path"])
+    return ctx.obj["daemon"]
+
+
+def _ask(ctx: click.Context, query: str, **params) -> Optional[dict]:
+    from rocks.errors import DaemonError
+
+    client = _daemon(ctx)
+    if client is None:
+        return None
+    try:
+        return client.call(query, **params)
+    except DaemonError as e:
+        click.echo(f"{e}, loading the manifest instead", err=True)
+        ctx.obj["daemon"] = None
+        return None
+
+
+def _report_stats(collected: stats.Stats, show_stats: bool, stats_json: Optional[str]):
+    if show_stats:
+        for line in collected.render():
+            click.echo(line, err=True)
+    if stats_json is not None:
+        with open(stats_json, "w") as report:
+            json.dump(collected.report(), report, indent=2)
+
+
+def _get_manifest(ctx: click.Context) -> Manifest:
+    if "manifest" not in ctx.obj:
+        ctx.obj["manifest"] = _load_manifest(ctx)
+    return ctx.obj["manifest"]
+
+
+def _load_manifest(ctx: click.Context) -> Manifest:
+    server: RockServer = _server(ctx)
+    if not ctx.obj["progress"]:
+        return server.get_manifest()
+
+    reported = []
+
+    def report(done: int, total: Optional[int]):
+        step = done * 100 // total if total else done >> 20
+        if reported and reported[-1] == step:
+            return
+        reported.append(step)
+        size = f"{done / 2 ** 20:.1f} of {total / 2 ** 20:.1f}" if total else f"{done / 2 ** 20:.1f}"
+        click.echo(f"\rmanifest: {size} MiB", err=True, nl=False)
+
+    try:
+        return server.get_manifest(report)
+    finally:
+        if reported:
+            click.echo(err=True)
 
 
 @main.command()
 @click.argument("package", default="")
 @click.pass_context
 def manifest(ctx: click.Context, package: str):
-    rocks_server: RockServer = ctx.obj["server"]
-    manifest_data = rocks_server.get_manifest()
-
-    if package != "":
-        searched = manifest_data.search(package)
-        if searched is None:
-            click.echo(f"package {package} not found", err=True)
-            packages = difflib.get_close_matches(package, [str(p) for p in manifest_data.packages])
-            if len(packages) > 0:
-                click.echo(f'try next: {",".join(packages)}', nl=True)
-            return
-        packages = [searched]
-    else:
-        packages = manifest_data.packages
-
-    for pos, package in enumerate(packages, 1):
-        click.echo(f"{pos}. {package.name}:")
-        for version in package.other_versions:
-            click.echo(f"\t- {version} [{','.join([arch for arch in version.arch])}]")
+    """PACKAGE is a name or a glob like `http*` or `*json*`, close names are suggested when nothing is found"""
+    found = _ask(ctx, "packages", package=package)
+    if found is None:
+        from rocks.query import find_packages
+        found = find_packages(_get_manifest(ctx), package)
+
+    if package != "" and not found["packages"]:
+        click.echo(f"package {package} not found", err=True)
+        if len(found["suggestions"]) > 0:
+            click.echo(f'try next: {",".join(found["suggestions"])}', nl=True)
+        return
 
-        for version in package.semver_versions:
-            click.echo(f"\t- {version} [{','.join([arch for arch in version.arch])}]")
+    for pos, package_data in enumerate(found["packages"], 1):
+        click.echo(f"{pos}. {package_data['name']}:")
+        for version in package_data["versions"]:
+            click.echo(f"\t- {version['display']} [{','.join(version['arch'])}]")
 
 
 @main.group(invoke_without_command=True)
 @click.argument("package_name")
 @click.pass_context
 def rockspec(ctx: click.Context, package_name: str):
-    rocks_server: RockServer = ctx.obj["server"]
+    from rocks.errors import QueryError
+
     if package_name == "":
         click.echo(ctx.get_usage())
         return
 
-    manifest_data = rocks_server.get_manifest()
-    ctx.obj["manifest"] = manifest_data
-
     if path.exists(package_name):
         with open(package_name) as specfile:
             ctx.obj["content"] = specfile.read()
             return
 
-    meta = package_name.split('@')
-
-    package = manifest_data.search(meta[0])
-    if package is None:
-        click.echo(f"not found: {meta[0]}", err=True)
-        return
-
-    if len(meta) > 1:
-        version = package.get_version(meta[1])
-        if version is None:
-            click.echo(f"version not found: {meta[1]}", err=True)
-            return
-    else:
-        version = package.latest_scm
-        if version is None:
-            version = package.latest_semver
-
-        if version is None:
-            click.echo("unable to find any latest version", err=True)
+    try:
+        found = _ask(ctx, "rockspec", package=package_name)
+        if found is not None:
+            ctx.obj["content"] = found["content"]
             return
 
-    if not version.get_arch("rockspec"):
-        click.echo(f"version {version.name}: has no `rockspec` arch")
-        return
+        from rocks.query import select_rockspec
+        package, version = select_rockspec(_get_manifest(ctx), package_name)
+    except QueryError as e:
+        click.echo(str(e), err=True)
+        ctx.exit(1)
 
-    ctx.obj["content"] = rocks_server.get_raw_file(f"{package.name}-{version.name}.rockspec")
+    ctx.obj["content"] = _server(ctx).get_raw_file(f"{package.name}-{version.name}.rockspec")
 
 
 @rockspec.command()
@@ -106,63 +228,290 @@ def show(ctx: click.Context):
 @click.option("--check-arch", default="rockspec")
 @click.pass_context
 def deptree(ctx: click.Context, check_arch: str):
+    from rocks.rockspec import Rockspec
+    from rocks.tree import DepTree, render
+
     if isinstance(ctx.obj["content"], str):
         content = ctx.obj["content"]
     else:
         content = ctx.obj["content"].decode("utf-8")
+    excluded_rules = ["tarantool", "lua"]  # no need package check
+
+    found = _ask(ctx, "deptree", content=content, check_arch=check_arch, excluded=excluded_rules)
+    if found is not None:
+        for line in found["lines"]:
+            click.echo(line)
+        return
+
     spec = Rockspec.from_string(content)
-    server: RockServer = ctx.obj["server"]
-    manifest_data: Manifest = ctx.obj["manifest"]
+    server: RockServer = _server(ctx)
+    tree = DepTree(server, _get_manifest(ctx), excluded_rules, check_arch)
+    for line in render(tree.resolve(spec), check_arch):
+        click.echo(line)
+
+
+@main.command()
+@click.argument("roots", nargs=-1, required=True)
+@click.option("--separate", is_flag=True, help="resolve every root on its own instead of one shared set")
+@click.option("--max-steps", default=100000, show_default=True, help="give up after this many tried versions")
+@click.pass_context
+def solve(ctx: click.Context, roots: tuple[str, ...], separate: bool, max_steps: int):
+    """ROOTS are rockspec files, `package@version` or rules like `package >= 1.0`"""
+    from rocks.rockspec import Rockspec
+    from rocks.solver import Solver, requirements_of, root_requirement
+
+    server: RockServer = _server(ctx)
     excluded_rules = ["tarantool", "lua"]  # no need package check
-    print_deps_recursive(server, manifest_data, spec, excluded_rules, 1, check_arch)
-        # print(package)
+    solver = Solver(server, _get_manifest(ctx), excluded_rules, max_steps)
+
+    groups = []
+    for root in roots:
+        if path.exists(root):
+            groups.append((root, requirements_of(Rockspec.open(root))))
+        else:
+            groups.append((root, [root_requirement(root)]))
+
+    if not separate:
+        groups = [(", ".join(roots), [requirement for _, requirements in groups for requirement in requirements])]
+
+    failed = False
+    for (title, _), resolution in zip(groups, solver.solve_each(requirements for _, requirements in groups)):
+        if not resolution.ok:
+            failed = True
+            click.echo(f"{title}: no solution", err=True)
+            for line in resolution.conflict.explain():
+                click.echo(f"\t{line}", err=True)
+            continue
+
+        click.echo(f"{title}:")
+        for name, version in sorted(resolution.versions.items()):
+            click.echo(f"\t{name} {version.name}")
 
+    if failed:
+        ctx.exit(1)
 
-def print_deps_recursive(
-        server: RockServer,
-        man: Manifest,
-        spec: Rockspec,
-        excluded: list[str],
-        level: int = 1,
-        check_arch: str = "rockspec",
+
+@main.command()
+@click.argument("package")
+@click.option("--version", help="only dependents whose rule accepts this version of PACKAGE")
+@click.option("--transitive", is_flag=True, help="also show what depends on the dependents, recursively")
+@click.option("--all-versions", is_flag=True, help="index every rockspec instead of the latest one of each package")
+@click.option("--index", "index_path", type=click.Path(dir_okay=False),
+              help="reverse dependency index file, defaults to one per --server and --lua-version in the cache")
+@click.pass_context
+def rdeps(
+        ctx: click.Context,
+        package: str,
+        version: Optional[str],
+        transitive: bool,
+        all_versions: bool,
+        index_path: Optional[str],
 ):
-    mark = u'\u2713'
-    unmark = 'x'
-    excluded = copy(excluded)
-
-    padding = '\t' * level
-    for rule in spec.deps_rules:
-        if rule.name in excluded:
-            click.echo(f"{padding} {rule} [{mark}, excluded]")
-            continue
+    """show which packages depend on PACKAGE and which of its versions they accept
 
-        if rule.name == spec.package:
-            click.echo(f"{padding} {rule} [{mark}, cyclicdep]")
-            continue
+    The index is updated only when the manifest changes. scm and dev rockspecs are then read again, because
+    they are rewritten in place, but a change to them alone is not noticed until the next manifest change.
+    """
+    from rocks.rdeps import RdepsIndex, default_index_path, render
 
-        package = man.search(rule.name)
-        if package is None:
-            click.echo(f"{padding} {rule} [{unmark}, not found in manifest]")
-            continue
+    server: RockServer = _server(ctx)
+    if index_path is None:
+        cache_dir = ctx.find_root().params["cache_dir"]
+        index_path = default_index_path(server.address, server.lua_version, cache_dir)
 
-        current_version = package.get_version_by_rule(rule.op, rule.version)
-        if current_version is None:
-            click.echo(f"{padding} {rule} [{unmark}, version not found]")
-            continue
+    index = RdepsIndex.open(index_path)
+    update = index.update(server, every=all_versions)
+    if update.changed:
+        click.echo(f"index: {update.added} rockspecs added, {update.refreshed} scm re-read, {update.removed} removed, "
+                   f"{len(update.broken)} unparsable, {len(update.failed)} failed to fetch", err=True)
+    for name in update.failed:
+        click.echo(f"failed {name}, rerun to retry", err=True)
+
+    nodes = index.tree(package, version, transitive)
+    click.echo(f"{package}: {len(nodes)} dependents")
+    for line in render(nodes):
+        click.echo(line)
+
+
+@main.command()
+@click.option("--workers", type=int, help="concurrent existence checks, defaults to --pool-size")
+@click.option("--rate", default=0.0, show_default=True, help="max requests per second, 0 is unlimited")
+@click.option("--output", type=click.Path(dir_okay=False),
+              help="append NDJSON results to this file; files already checked there are skipped")
+@click.option("--only-missing", is_flag=True, help="print only files which are not ok to stdout")
+@click.pass_context
+def audit(ctx: click.Context, workers: Optional[int], rate: float, output: Optional[str], only_missing: bool):
+    from rocks.audit import OK, Auditor, AuditResult, completed_results
 
-        has_arch = mark if current_version.has_arch(check_arch) else unmark
-        has_arch_file = mark if server.file_exists(package.name, current_version.name, check_arch) else unmark
+    server: RockServer = _server(ctx)
+    manifest_data = _get_manifest(ctx)
 
-        try:
-            cur_spec = Rockspec.from_string(
-                server.get_raw_file(f"{rule.name}-{current_version.name}.rockspec").decode("utf-8")
-            )
+    previous = {}
+    if output is not None and path.exists(output):
+        with open(output) as previous_results:
+            previous = completed_results(previous_results)
+
+    results = None if output is None else ctx.with_resource(open(output, "a"))
+    failed = False
+
+    def report(result: AuditResult, store: bool = True):
+        nonlocal failed
+        failed = failed or result.status != OK
+        if results is not None and store:
+            results.write(result.to_json() + "\n")
+            results.flush()
+        if result.status != OK if only_missing else results is None:
+            click.echo(result.to_json())
+
+    for result in previous.values():
+        report(result, store=False)
+
+    try:
+        for result in Auditor(server, workers, rate).run(manifest_data, previous):
+            report(result)
+    except KeyboardInterrupt:
+        click.echo("interrupted, rerun with the same --output to resume", err=True)
+        ctx.exit(130)
+
+    if failed:
+        ctx.exit(1)
+
+
+@main.command()
+@click.argument("destination", type=click.Path(file_okay=False))
+@click.option("--workers", type=int, help="concurrent downloads, defaults to --pool-size")
+@click.option("--prune", is_flag=True, help="remove mirrored files which are no longer in the source manifest")
+@click.option("--dry-run", is_flag=True, help="only show what would be fetched")
+@click.option("--revalidate", is_flag=True, help="also check mirrored releases for changes, not only scm and dev files")
+@click.pass_context
+def mirror(ctx: click.Context, destination: str, workers: Optional[int], prune: bool, dry_run: bool, revalidate: bool):
+    from rocks.mirror import Mirror
+
+    server: RockServer = _server(ctx)
+    rocks_mirror = Mirror(server, destination, workers)
+    plan = rocks_mirror.plan(revalidate)
+    click.echo(f"{plan.manifest_name}: {len(plan.added)} added, {len(plan.removed)} removed, "
+               f"{len(plan.fetch)} to fetch, {len(plan.refresh)} to revalidate", err=True)
+
+    if dry_run:
+        for name in plan.fetch:
+            click.echo(name)
+        return
+
+    def progress(name: str, error: Optional[str]):
+        if error is not None:
+            click.echo(f"failed {name}: {error}", err=True)
+        else:
+            click.echo(f"fetched {name}")
+
+    result = rocks_mirror.run(plan, prune=prune, progress=progress)
+    if result.unchanged:
+        click.echo(f"{len(result.unchanged)} revalidated files unchanged", err=True)
+    for name in result.pruned:
+        click.echo(f"removed {name}")
+
+    if not result.published:
+        click.echo(f"{len(result.failed)} files failed, manifest is not published; rerun to resume", err=True)
+        ctx.exit(1)
+
+
+@main.command()
+@click.option("--listen", help="also answer queries over tcp on HOST:PORT")
+@click.option("--refresh", default=60.0, show_default=True, help="seconds between manifest revalidations")
+@click.pass_context
+def serve(ctx: click.Context, listen: Optional[str], refresh: float):
+    """keep the parsed manifest in memory and answer manifest, rockspec and deptree queries of other runs"""
+    import signal
+    import sys
+
+    from rocks.daemon import ManifestDaemon
+    from rocks.daemon import serve as serve_daemon
+
+    socket_path = ctx.obj["socket_path"]
+    if _daemon(ctx) is not None:
+        click.echo(f"another daemon is already serving {socket_path}", err=True)
+        ctx.exit(1)
+
+    address = None
+    if listen is not None:
+        host, _, port = listen.rpartition(":")
+        address = (host or "127.0.0.1", int(port))
+
+    daemon = ManifestDaemon(_server(ctx), refresh)
+    daemon.load()
+    click.echo(f"serving {daemon.manifest_name} ({len(daemon.manifest.packages)} packages) on {socket_path}"
+               + ("" if address is None else f" and {listen}"), err=True)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        serve_daemon(daemon, socket_path, address, log=lambda message: click.echo(message, err=True))
+    except KeyboardInterrupt:
+        pass
+
+
+def _publish_target(ctx: click.Context, target: Optional[str]) -> Backend:
+    from rocks.backend import backend_for
+
+    server: RockServer = _server(ctx)
+    if target is None:
+        return server.backend
+
+    backend = backend_for(target, pool_size=server.pool_size)
+    ctx.call_on_close(backend.close)
+    return backend
+
+
+def _report_publish(ctx: click.Context, action: str, run: Callable[[], PublishResult]):
+    import requests
+
+    from rocks.errors import MainError
+
+    try:
+        result = run()
+    except (MainError, requests.RequestException) as e:
+        click.echo(str(e), err=True)
+        click.echo("manifest is not published", err=True)
+        ctx.exit(1)
+
+    for name in result.transferred:
+        click.echo(f"{action} {name}")
+    for name, error in result.failed.items():
+        click.echo(f"failed {name}: {error}", err=True)
+
+    if result.manifest is None:
+        click.echo("manifest is not published", err=True)
+        ctx.exit(1)
+
+    click.echo(f"manifest published after {result.attempts} attempt(s)", err=True)
+    for name in result.dropped:
+        click.echo(f"removed stale {name}, clients fall back to the updated manifest", err=True)
+    if result.failed:
+        ctx.exit(1)
+
+
+@main.command()
+@click.argument("files", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("--target", help="where to put files: local directory, file:// or http url accepting PUT; "
+                               "defaults to --server")
+@click.option("--workers", default=10, show_default=True, help="concurrent transfers")
+@click.pass_context
+def upload(ctx: click.Context, files: tuple[str, ...], target: Optional[str], workers: int):
+    from rocks.publish import Publisher, describe
+
+    publisher = Publisher(_publish_target(ctx, target), workers=workers)
+    _report_publish(ctx, "uploaded", lambda: publisher.upload(describe(files)))
+
+
+@main.command()
+@click.argument("files", nargs=-1, required=True)
+@click.option("--target", help="where to remove files from: local directory, file:// or http url accepting DELETE; "
+                               "defaults to --server")
+@click.option("--workers", default=10, show_default=True, help="concurrent transfers")
+@click.pass_context
+def remove(ctx: click.Context, files: tuple[str, ...], target: Optional[str], workers: int):
+    from rocks.publish import Publisher, RockFile
 
-            click.echo(
-                f"{padding} {rule} [{current_version} {check_arch}: manifest({has_arch})/file({has_arch_file}) ]")
-            print_deps_recursive(server, man, cur_spec, excluded, level + 1)
-        except FileLoadError:
-            click.echo(f"{padding} {rule} [{current_version} {unmark}, has rockspec in manifest, but file not found]")
+    publisher = Publisher(_publish_target(ctx, target), workers=workers)
+    _report_publish(ctx, "removed", lambda: publisher.remove([RockFile.from_path(name) for name in files]))
 
 
 if __name__ == '__main__':
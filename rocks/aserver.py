@@ -0,0 +1,136 @@
+import asyncio
+import http
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Iterable, Optional, TypeVar, Union
+
+from rocks.errors import FileLoadError
+from rocks.lazy import lazy_import
+from rocks.manifest import Manifest
+from rocks.rockspec import Rockspec
+from rocks.server import RockServer
+from rocks.tree import DepNode, DepTree
+
+_requests = lazy_import("requests")
+
+T = TypeVar("T")
+
+
+class AsyncRockServer:
+
+    def __init__(
+            self,
+            server: RockServer,
+            concurrency: Optional[int] = None,
+            timeout: Optional[float] = None,
+            parse_executor: Optional[Executor] = None,
+    ):
+        self.server = server
+        self.concurrency = concurrency or server.pool_size
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.io_executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="rocks-io")
+        self.parse_executor = parse_executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="rocks-parse")
+
+    @classmethod
+    def from_address(cls, address: str, concurrency: Optional[int] = None, timeout: Optional[float] = None,
+                     **server_options) -> 'AsyncRockServer':
+        return cls(RockServer(address, **server_options), concurrency, timeout)
+
+    async def close(self):
+        self.io_executor.shutdown(wait=False, cancel_futures=True)
+        self.parse_executor.shutdown(wait=False, cancel_futures=True)
+        self.server.close()
+
+    async def __aenter__(self) -> 'AsyncRockServer':
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def _io(self, func: Callable[..., T], *args, timeout: Optional[float] = None) -> T:
+        async with self.semaphore:
+            future = asyncio.get_running_loop().run_in_executor(self.io_executor, func, *args)
+            return await asyncio.wait_for(future, timeout or self.timeout)
+
+    async def parse(self, func: Callable[..., T], *args) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self.parse_executor, func, *args)
+
+    async def get_manifest(self, timeout: Optional[float] = None) -> Manifest:
+        name, content = await self._io(self.server.get_manifest_file, timeout=timeout)
+        return await self.parse(self.server.load_manifest, name, content)
+
+    async def get_raw_file(self, name: str, timeout: Optional[float] = None) -> bytes:
+        return await self._io(self.server.get_raw_file, name, timeout=timeout)
+
+    async def raw_file_exists(self, name: str, timeout: Optional[float] = None) -> bool:
+        return await self._io(self.server.raw_file_exists, name, timeout=timeout)
+
+    async def file_exists(self, package_name: str, version: str, arch: str, timeout: Optional[float] = None) -> bool:
+        return await self.raw_file_exists(RockServer.arch_file_name(package_name, version, arch), timeout)
+
+    async def get_rockspec(self, name: str, timeout: Optional[float] = None) -> Rockspec:
+        content = await self.get_raw_file(name, timeout)
+        return await self.parse(Rockspec.from_string, content)
+
+    async def get_many(
+            self,
+            names: Iterable[str],
+            timeout: Optional[float] = None,
+    ) -> dict[str, Union[bytes, FileLoadError, None]]:
+        async def load(name: str) -> Union[bytes, FileLoadError, None]:
+            try:
+                return await self.get_raw_file(name, timeout)
+            except FileLoadError as e:
+                return None if e.status_code == http.HTTPStatus.NOT_FOUND else e
+            except _requests().RequestException as e:
+                return FileLoadError(f"Unable to get file: {e}")
+            except asyncio.TimeoutError:
+                return FileLoadError(f"Unable to get file: timed out: {name}")
+
+        names = list(dict.fromkeys(names))
+        return dict(zip(names, await asyncio.gather(*map(load, names))))
+
+    async def exists_many(
+            self,
+            names: Iterable[str],
+            timeout: Optional[float] = None,
+    ) -> dict[str, Union[bool, FileLoadError]]:
+        async def check(name: str) -> Union[bool, FileLoadError]:
+            try:
+                return await self.raw_file_exists(name, timeout)
+            except _requests().RequestException as e:
+                return FileLoadError(f"Unable to check file: {e}")
+            except asyncio.TimeoutError:
+                return FileLoadError(f"Unable to check file: timed out: {name}")
+
+        names = list(dict.fromkeys(names))
+        listing = await self._io(self.server.listing, timeout=timeout)
+        if listing is not None:
+            return {name: name in listing for name in names}
+
+        return dict(zip(names, await asyncio.gather(*map(check, names))))
+
+
+class AsyncDepTree(DepTree):
+
+    def __init__(self, server: AsyncRockServer, man: Manifest, excluded: list[str], check_arch: str = "rockspec"):
+        super().__init__(server.server, man, excluded, check_arch)
+        self.async_server = server
+
+    async def _fetch_async(self, nodes: list[DepNode]):
+        arch_files, rockspecs = self.missing(nodes)
+        files, contents = await asyncio.gather(
+            self.async_server.exists_many(arch_files),
+            self.async_server.get_many(rockspecs),
+        )
+        await self.async_server.parse(self.store, files, contents)
+
+    async def resolve_async(self, spec: Rockspec) -> list[DepNode]:
+        walk = self.walk(spec)
+        try:
+            nodes = next(walk)
+            while True:
+                await self._fetch_async(nodes)
+                nodes = walk.send(None)
+        except StopIteration as stop:
+            return stop.value
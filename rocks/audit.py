@@ -0,0 +1,115 @@
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from typing import Iterable, Iterator, Optional
+
+from rocks.lazy import lazy_import
+from rocks.manifest import Manifest
+from rocks.server import RockServer
+
+_requests = lazy_import("requests")
+
+OK = "ok"
+MISSING = "missing"
+ERROR = "error"
+
+
+@dataclass
+class AuditResult:
+    package: str
+    version: str
+    arch: str
+    file: str
+    status: str
+    error: Optional[str] = None
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        if self.error is None:
+            del data["error"]
+        return json.dumps(data)
+
+
+class RateLimiter:
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+def manifest_files(man: Manifest) -> Iterator[tuple[str, str, str, str]]:
+    for package in man.packages:
+        for version in package.other_versions + package.semver_versions:
+            for arch in version.arch:
+                yield package.name, version.name, arch, RockServer.arch_file_name(package.name, version.name, arch)
+
+
+def completed_results(lines: Iterable[str]) -> dict[str, AuditResult]:
+    results = {}
+    for line in lines:
+        try:
+            result = AuditResult(**json.loads(line))
+        except (ValueError, TypeError):
+            continue
+        if result.status in (OK, MISSING):
+            results[result.file] = result
+    return results
+
+
+class Auditor:
+
+    def __init__(self, server: RockServer, workers: Optional[int] = None, rate: float = 0):
+        self.server = server
+        self.workers = workers or server.pool_size
+        self.limiter = RateLimiter(rate, burst=self.workers)
+
+    def _check(self, package: str, version: str, arch: str, file_name: str) -> AuditResult:
+        if self.server.listing() is None:
+            self.limiter.acquire()
+        try:
+            exists = self.server.raw_file_exists(file_name)
+        except _requests().RequestException as e:
+            return AuditResult(package, version, arch, file_name, ERROR, str(e))
+        return AuditResult(package, version, arch, file_name, OK if exists else MISSING)
+
+    def run(self, man: Manifest, skip: Iterable[str] = ()) -> Iterator[AuditResult]:
+        skip = set(skip)
+        entries = (entry for entry in manifest_files(man) if entry[3] not in skip)
+        pending: set[Future] = set()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                for entry in entries:
+                    pending.add(executor.submit(self._check, *entry))
+                    if len(pending) < self.workers * 2:
+                        continue
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            finally:
+                for future in pending:
+                    future.cancel()
@@ -0,0 +1,312 @@
+import fcntl
+import hashlib
+import http
+import mmap
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from os import path
+from typing import TYPE_CHECKING, BinaryIO, Callable, Iterator, Mapping, Optional, Union
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
+
+from rocks import stats
+from rocks.errors import FileLoadError, PublishConflictError
+from rocks.files import atomic_write, map_file
+from rocks.lazy import lazy_import
+
+if TYPE_CHECKING:
+    import requests
+
+_requests = lazy_import("requests")
+
+BytesLike = Union[bytes, mmap.mmap]
+Progress = Callable[[int, Optional[int]], None]
+_CONTENT_TAG = "sha256:"
+_CHUNK_SIZE = 1 << 16
+
+
+@dataclass
+class Fetched:
+    content: bytes
+    status_code: int = http.HTTPStatus.OK
+    headers: Mapping[str, str] = field(default_factory=dict)
+
+
+class Backend:
+    address: str
+    cacheable = False
+
+    def fetch(self, name: str, headers: Optional[dict[str, str]] = None) -> Fetched:
+        raise NotImplementedError
+
+    def exists(self, name: str) -> bool:
+        raise NotImplementedError
+
+    def listing(self) -> Optional[frozenset[str]]:
+        return None
+
+    def refresh(self):
+        pass
+
+    def download(
+            self,
+            name: str,
+            file: BinaryIO,
+            headers: Optional[dict[str, str]] = None,
+            progress: Optional[Progress] = None,
+    ) -> Fetched:
+        fetched = self.fetch(name, headers)
+        file.write(fetched.content)
+        if progress is not None:
+            progress(len(fetched.content), len(fetched.content))
+        return Fetched(b"", fetched.status_code, fetched.headers)
+
+    @contextmanager
+    def mapped(self, name: str, progress: Optional[Progress] = None) -> Iterator[BytesLike]:
+        with tempfile.TemporaryFile() as file:
+            self.download(name, file, progress=progress)
+            file.flush()
+            with map_file(file) as content:
+                yield content
+
+    def fetch_tagged(self, name: str) -> tuple[bytes, str]:
+        content = self.fetch(name).content
+        return content, content_tag(content)
+
+    def put(self, name: str, content: bytes):
+        raise NotImplementedError
+
+    def swap(self, name: str, content: bytes, expected: Optional[str]):
+        raise NotImplementedError
+
+    def delete(self, name: str):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def content_tag(content: bytes) -> str:
+    return _CONTENT_TAG + hashlib.sha256(content).hexdigest()
+
+
+def is_content_tag(tag: str) -> bool:
+    return tag.startswith(_CONTENT_TAG)
+
+
+class HttpBackend(Backend):
+    cacheable = True
+
+    def __init__(
+            self,
+            address: str,
+            pool_size: int = 10,
+            keep_alive: bool = True,
+            timeout: Union[float, tuple[float, float], None] = (5.0, 30.0),
+            gzip: bool = True,
+            retries: int = 2,
+    ):
+        self.address = address
+        self.timeout = timeout
+        from urllib3 import Retry
+
+        requests = _requests()
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=retries, backoff_factor=0.1, allowed_methods=("GET", "HEAD")),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept-Encoding"] = "gzip, deflate" if gzip else "identity"
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+
+    @staticmethod
+    def _is_modified(response: 'requests.Response', headers: Optional[dict[str, str]]) -> bool:
+        if response.status_code == http.HTTPStatus.NOT_MODIFIED and headers:
+            return False
+
+        if response.status_code < http.HTTPStatus.OK or response.status_code >= http.HTTPStatus.MULTIPLE_CHOICES:
+            raise FileLoadError(
+                f"Unable to get file: [{response.status_code}] {response.url}",
+                response.status_code,
+            )
+        return True
+
+    def fetch(self, name: str, headers: Optional[dict[str, str]] = None) -> Fetched:
+        started = time.perf_counter()
+        with stats.phase("fetch"):
+            response = self.session.get(path.join(self.address, name), headers=headers, timeout=self.timeout)
+            content = response.content
+        stats.request("GET", time.perf_counter() - started, len(content))
+
+        if not self._is_modified(response, headers):
+            return Fetched(b"", response.status_code, response.headers)
+
+        return Fetched(content, response.status_code, response.headers)
+
+    def download(
+            self,
+            name: str,
+            file: BinaryIO,
+            headers: Optional[dict[str, str]] = None,
+            progress: Optional[Progress] = None,
+    ) -> Fetched:
+        url = path.join(self.address, name)
+        started = time.perf_counter()
+        size = 0
+        with stats.phase("fetch"):
+            response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+            try:
+                if not self._is_modified(response, headers):
+                    return Fetched(b"", response.status_code, response.headers)
+
+                length = response.headers.get("Content-Length")
+                total = int(length) if length is not None and length.isdigit() else None
+                for chunk in response.iter_content(_CHUNK_SIZE):
+                    file.write(chunk)
+                    size += len(chunk)
+                    if progress is not None:
+                        progress(response.raw.tell(), total)
+
+                return Fetched(b"", response.status_code, response.headers)
+            finally:
+                response.close()
+                stats.request("GET", time.perf_counter() - started, size)
+
+    def exists(self, name: str) -> bool:
+        started = time.perf_counter()
+        with stats.phase("fetch"):
+            response = self.session.head(path.join(self.address, name), timeout=self.timeout)
+        stats.request("HEAD", time.perf_counter() - started, 0)
+        return response.status_code == http.HTTPStatus.OK
+
+    def fetch_tagged(self, name: str) -> tuple[bytes, str]:
+        fetched = self.fetch(name, {"Cache-Control": "no-cache"})
+        return fetched.content, fetched.headers.get("ETag") or content_tag(fetched.content)
+
+    def _send(self, method: str, name: str, content: Optional[bytes] = None, headers: Optional[dict] = None):
+        url = path.join(self.address, name)
+        started = time.perf_counter()
+        response = self.session.request(method, url, data=content, headers=headers, timeout=self.timeout)
+        stats.request(method, time.perf_counter() - started, len(content or b""))
+        if response.status_code == http.HTTPStatus.PRECONDITION_FAILED:
+            raise PublishConflictError(f"{url} was changed by someone else")
+        if response.status_code < http.HTTPStatus.OK or response.status_code >= http.HTTPStatus.MULTIPLE_CHOICES:
+            raise FileLoadError(f"Unable to {method} file: [{response.status_code}] {url}", response.status_code)
+
+    def put(self, name: str, content: bytes):
+        self._send("PUT", name, content)
+
+    def swap(self, name: str, content: bytes, expected: Optional[str]):
+        if expected is None:
+            headers = {"If-None-Match": "*"}
+        elif is_content_tag(expected):
+            _, tag = self.fetch_tagged(name)
+            if tag != expected:
+                raise PublishConflictError(f"{name} was changed by someone else")
+            headers = None
+        else:
+            headers = {"If-Match": expected}
+
+        self._send("PUT", name, content, headers)
+
+    def delete(self, name: str):
+        self._send("DELETE", name)
+
+    def close(self):
+        self.session.close()
+
+
+class LocalBackend(Backend):
+
+    def __init__(self, directory: str):
+        self.address = directory
+        self.directory = directory
+        self._root = path.abspath(directory)
+        self._listing: Optional[frozenset[str]] = None
+        self._listing_lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        file_path = path.abspath(path.join(self._root, name))
+        if path.dirname(file_path) != self._root:
+            raise FileLoadError(f"Unable to get file outside of {self.directory}: {name}")
+        return file_path
+
+    def fetch(self, name: str, headers: Optional[dict[str, str]] = None) -> Fetched:
+        try:
+            with stats.phase("fetch"), open(self._path(name), "rb") as file:
+                return Fetched(file.read())
+        except (FileNotFoundError, IsADirectoryError):
+            raise FileLoadError(f"Unable to get file: [{http.HTTPStatus.NOT_FOUND}] {name}",
+                                http.HTTPStatus.NOT_FOUND) from None
+
+    def exists(self, name: str) -> bool:
+        return name in self.listing()
+
+    def listing(self) -> frozenset[str]:
+        if self._listing is None:
+            with self._listing_lock:
+                if self._listing is None:
+                    with os.scandir(self.directory) as entries:
+                        self._listing = frozenset(entry.name for entry in entries if entry.is_file())
+        return self._listing
+
+    def refresh(self):
+        self._listing = None
+
+    def put(self, name: str, content: bytes):
+        atomic_write(self._path(name), content)
+        self.refresh()
+
+    def swap(self, name: str, content: bytes, expected: Optional[str]):
+        lock = os.open(self._root, os.O_RDONLY)
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                current = self.fetch(name).content
+            except FileLoadError as e:
+                if e.status_code != http.HTTPStatus.NOT_FOUND:
+                    raise
+                current = None
+
+            if (None if current is None else content_tag(current)) != expected:
+                raise PublishConflictError(f"{name} was changed by someone else")
+
+            self.put(name, content)
+        finally:
+            os.close(lock)
+
+    def delete(self, name: str):
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+        self.refresh()
+
+    @contextmanager
+    def mapped(self, name: str, progress: Optional[Progress] = None) -> Iterator[BytesLike]:
+        try:
+            file = open(self._path(name), "rb")
+        except (FileNotFoundError, IsADirectoryError):
+            raise FileLoadError(f"Unable to get file: [{http.HTTPStatus.NOT_FOUND}] {name}",
+                                http.HTTPStatus.NOT_FOUND) from None
+
+        with file, map_file(file) as content:
+            if progress is not None:
+                progress(len(content), len(content))
+            yield content
+
+
+def backend_for(address: str, **http_options) -> Backend:
+    if address.startswith("file://"):
+        return LocalBackend(url2pathname(urlsplit(address).path))
+    if "://" not in address and path.isdir(address):
+        return LocalBackend(address)
+    return HttpBackend(address, **http_options)
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import IO, Iterator, Mapping, Optional
+
+from rocks.files import atomic_write, map_file
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    path: str
+    stored_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    missing: bool = False
+
+    def validators(self) -> dict[str, str]:
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+
+    def __init__(
+            self,
+            directory: str,
+            max_age: float = 300,
+            max_size: int = 256 * 1024 * 1024,
+            immutable: tuple[str, ...] = (".rockspec", ".rock"),
+    ):
+        self.directory = directory
+        self.max_age = max_age
+        self.max_size = max_size
+        self.immutable = immutable
+        self._pinned: Counter = Counter()
+        self._pinned_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        body_path = self._path(url)
+        try:
+            with open(body_path + ".json") as metafile:
+                meta = json.load(metafile)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if meta.get("url") != url or not os.path.exists(body_path):
+            return None
+
+        return CacheEntry(path=body_path, **meta)
+
+    def read(self, entry: CacheEntry) -> Optional[bytes]:
+        try:
+            with open(entry.path, "rb") as body:
+                content = body.read()
+            os.utime(entry.path)
+        except FileNotFoundError:
+            return None
+
+        return content
+
+    @contextmanager
+    def mapped(self, entry: CacheEntry) -> Iterator:
+        with open(entry.path, "rb") as body, map_file(body) as content:
+            os.utime(entry.path)
+            yield content
+
+    @contextmanager
+    def pinned(self, url: str) -> Iterator[None]:
+        body_path = self._path(url)
+        with self._pinned_lock:
+            self._pinned[body_path] += 1
+        try:
+            yield
+        finally:
+            with self._pinned_lock:
+                self._pinned[body_path] -= 1
+                if self._pinned[body_path] == 0:
+                    del self._pinned[body_path]
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        if entry.url.endswith(self.immutable) and not entry.missing:
+            return True
+
+        return time.time() - entry.stored_at < self.max_age
+
+    def _entry(self, url: str, headers: Mapping[str, str]) -> CacheEntry:
+        body_path = self._path(url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        return CacheEntry(
+            url=url,
+            path=body_path,
+            stored_at=time.time(),
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+        )
+
+    @contextmanager
+    def receive(self, url: str) -> Iterator[IO[bytes]]:
+        directory = os.path.dirname(self._path(url))
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".tmp", delete=False) as file:
+            try:
+                yield file
+            finally:
+                if os.path.exists(file.name):
+                    os.remove(file.name)
+
+    def store_file(self, url: str, file: IO[bytes], headers: Mapping[str, str]) -> CacheEntry:
+        entry = self._entry(url, headers)
+        file.flush()
+        os.replace(file.name, entry.path)
+        self._write_meta(entry)
+        self.evict(keep=entry.path)
+
+        return entry
+
+    def store_missing(self, url: str) -> CacheEntry:
+        body_path = self._path(url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        entry = CacheEntry(url=url, path=body_path, stored_at=time.time(), missing=True)
+
+        atomic_write(body_path, b"")
+        self._write_meta(entry)
+
+        return entry
+
+    def revalidated(self, entry: CacheEntry):
+        entry.stored_at = time.time()
+        self._write_meta(entry)
+
+    def evict(self, keep: Optional[str] = None):
+        with self._pinned_lock:
+            pinned = {*self._pinned, keep}
+        files = []
+        total = 0
+        for bucket in os.scandir(self.directory):
+            if not bucket.is_dir():
+                continue
+            for item in os.scandir(bucket.path):
+                if item.name.endswith((".json", ".tmp")):
+                    continue
+                stat = item.stat()
+                total += stat.st_size
+                if item.path not in pinned:
+                    files.append((stat.st_mtime, stat.st_size, item.path))
+
+        if total <= self.max_size:
+            return
+
+        files.sort()
+        for _, size, body_path in files:
+            for file_path in (body_path + ".json", body_path):
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            if total <= self.max_size:
+                break
+
+    def _write_meta(self, entry: CacheEntry):
+        meta = asdict(entry)
+        del meta["path"]
+        atomic_write(entry.path + ".json", json.dumps(meta).encode("utf-8"))
@@ -0,0 +1,63 @@
+import hashlib
+import http.client
+import json
+import os
+import socket
+import tempfile
+from typing import Optional
+
+from rocks.errors import DaemonError, QueryError
+
+
+def default_socket_path(address: str, lua_version: Optional[str] = None) -> str:
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    key = hashlib.sha1(f"{address}|{lua_version or ''}".encode("utf-8")).hexdigest()[:12]
+    return os.path.join(directory, f"rocks-admin-{key}.sock")
+
+
+class _UnixConnection(http.client.HTTPConnection):
+
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class DaemonClient:
+
+    def __init__(self, socket_path: str, timeout: float = 60.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    @classmethod
+    def connect(cls, socket_path: str, timeout: float = 60.0) -> Optional['DaemonClient']:
+        if not os.path.exists(socket_path):
+            return None
+
+        client = cls(socket_path, timeout)
+        try:
+            client.call("status")
+        except (DaemonError, QueryError):
+            return None
+        return client
+
+    def call(self, query: str, **params) -> dict:
+        connection = _UnixConnection(self.socket_path, self.timeout)
+        try:
+            connection.request("POST", f"/{query}", json.dumps(params), {"Content-Type": "application/json"})
+            response = connection.getresponse()
+            body = json.loads(response.read() or b"{}")
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            raise DaemonError(f"daemon on {self.socket_path} failed: {e}") from None
+        finally:
+            connection.close()
+
+        if response.status >= http.HTTPStatus.INTERNAL_SERVER_ERROR:
+            raise DaemonError(f"daemon on {self.socket_path} failed: {body.get('error', response.status)}")
+        if response.status >= http.HTTPStatus.BAD_REQUEST:
+            raise QueryError(body.get("error", f"daemon answered {response.status}"), response.status)
+        return body
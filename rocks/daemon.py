@@ -0,0 +1,246 @@
+import http
+import inspect
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+from rocks.backend import content_tag, is_content_tag
+from rocks.errors import DepRuleError, FileLoadError, MainError, QueryError
+from rocks.files import map_file
+from rocks.manifest import Manifest
+from rocks.query import EXCLUDED, find_packages, node_json, select_rockspec, version_json
+from rocks.rockspec import DepRule, Rockspec
+from rocks.server import RockServer
+from rocks.tree import DepTree, render
+
+
+class ManifestDaemon:
+
+    def __init__(self, server: RockServer, refresh_interval: float = 60.0):
+        self.server = server
+        self.refresh_interval = refresh_interval
+        self.manifest: Optional[Manifest] = None
+        self.manifest_name: Optional[str] = None
+        self.tag: Optional[str] = None
+        self.loaded_at: Optional[float] = None
+        self.specs: dict[str, Optional[Rockspec]] = {}
+        self.files: dict[str, bool] = {}
+        self.invalid: dict[str, str] = {}
+        self._stop = threading.Event()
+
+    def load(self) -> bool:
+        names = self.server.manifest_names() if self.manifest_name is None else [self.manifest_name]
+        for name in names:
+            headers = None
+            if name == self.manifest_name and self.tag is not None and not is_content_tag(self.tag):
+                headers = {"If-None-Match": self.tag}
+
+            with tempfile.TemporaryFile() as file:
+                try:
+                    fetched = self.server.backend.download(name, file, headers)
+                except FileLoadError as e:
+                    if e.status_code != http.HTTPStatus.NOT_FOUND:
+                        raise
+                    continue
+                if fetched.status_code == http.HTTPStatus.NOT_MODIFIED:
+                    return False
+
+                file.flush()
+                with map_file(file) as content:
+                    tag = fetched.headers.get("ETag") or content_tag(content)
+                    if tag == self.tag:
+                        return False
+                    man = self.server.load_manifest(name, content)
+            man.search_index
+
+            self.server.refresh()
+            self.manifest, self.manifest_name, self.tag, self.loaded_at = man, name, tag, time.time()
+            self.specs, self.files, self.invalid = {}, {}, {}
+            return True
+
+        raise FileLoadError(f"Unable to find any manifest on {self.server.address}", http.HTTPStatus.NOT_FOUND)
+
+    def refresh_forever(self, log: Callable[[str], None]):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                if self.load():
+                    log(f"reloaded {self.manifest_name}: {len(self.manifest.packages)} packages")
+            except (MainError, OSError) as e:
+                log(f"refresh failed: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self) -> dict:
+        return {
+            "server": self.server.address,
+            "manifest": self.manifest_name,
+            "tag": self.tag,
+            "loaded_at": self.loaded_at,
+            "packages": len(self.manifest.packages),
+        }
+
+    def packages(self, package: str = "") -> dict:
+        return find_packages(self.manifest, package)
+
+    def resolve(self, rule: str) -> dict:
+        try:
+            dep_rule = DepRule.from_str(rule)
+        except DepRuleError as e:
+            raise QueryError(str(e)) from None
+
+        package = self.manifest.search(dep_rule.name)
+        version = None if package is None else package.get_version_by_rules(dep_rule.constraints)
+        return {"rule": str(dep_rule), "version": None if version is None else version_json(version)}
+
+    def rockspec(self, package: str) -> dict:
+        found, version = select_rockspec(self.manifest, package)
+        name = f"{found.name}-{version.name}.rockspec"
+        try:
+            content = self.server.get_raw_file(name)
+        except FileLoadError as e:
+            raise QueryError(str(e), e.status_code or http.HTTPStatus.BAD_GATEWAY) from None
+        return {"package": found.name, "version": version.name, "content": content.decode("utf-8")}
+
+    def deptree(
+            self,
+            package: Optional[str] = None,
+            content: Optional[str] = None,
+            check_arch: str = "rockspec",
+            excluded: Optional[list[str]] = None,
+    ) -> dict:
+        if content is None:
+            if package is None:
+                raise QueryError("either package or content is required")
+            content = self.rockspec(package)["content"]
+
+        try:
+            spec = Rockspec.from_string(content)
+        except MainError as e:
+            raise QueryError(str(e)) from None
+
+        tree = DepTree(self.server, self.manifest, list(EXCLUDED if excluded is None else excluded), check_arch)
+        tree.specs, tree.files, tree.invalid = self.specs, self.files, self.invalid
+        nodes = tree.resolve(spec)
+        return {"lines": list(render(nodes, check_arch)), "tree": [node_json(node) for node in nodes]}
+
+    def query(self, name: str, params: dict) -> dict:
+        if name not in _QUERIES:
+            raise QueryError(f"unknown query: {name}", http.HTTPStatus.NOT_FOUND)
+
+        method = getattr(self, name)
+        try:
+            inspect.signature(method).bind(**params)
+        except TypeError as e:
+            raise QueryError(str(e)) from None
+        return method(**params)
+
+
+_QUERIES = frozenset(("status", "packages", "resolve", "rockspec", "deptree"))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        self._answer(url.path.strip("/"), dict(parse_qsl(url.query)))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            params = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            self._send(http.HTTPStatus.BAD_REQUEST, {"error": f"invalid json: {e}"})
+            return
+        if not isinstance(params, dict):
+            self._send(http.HTTPStatus.BAD_REQUEST, {"error": "parameters must be a json object"})
+            return
+        self._answer(urlsplit(self.path).path.strip("/"), params)
+
+    def _answer(self, name: str, params: dict):
+        try:
+            self._send(http.HTTPStatus.OK, self.server.daemon.query(name, params))
+        except QueryError as e:
+            self._send(e.status_code, {"error": str(e)})
+        except (MainError, OSError) as e:
+            self._send(http.HTTPStatus.BAD_GATEWAY, {"error": str(e)})
+        except Exception as e:
+            self.server.log(f"{name} failed:\n{traceback.format_exc()}")
+            self._send(http.HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"internal error: {e!r}"})
+
+    def _send(self, status: int, body: dict):
+        content = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, daemon: ManifestDaemon, log: Callable[[str], None]):
+        super().__init__(socket_path, _Handler)
+        self.daemon = daemon
+        self.log = log
+
+
+class _TcpServer(ThreadingHTTPServer):
+
+    def __init__(self, address: tuple[str, int], daemon: ManifestDaemon, log: Callable[[str], None]):
+        super().__init__(address, _Handler)
+        self.daemon = daemon
+        self.log = log
+
+
+def _remove_stale_socket(socket_path: str):
+    if not os.path.exists(socket_path):
+        return
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except ConnectionRefusedError:
+        os.remove(socket_path)
+        return
+    finally:
+        probe.close()
+    raise QueryError(f"another daemon is already serving {socket_path}", http.HTTPStatus.CONFLICT)
+
+
+def serve(daemon: ManifestDaemon, socket_path: str, listen: Optional[tuple[str, int]] = None,
+          log: Callable[[str], None] = print):
+    _remove_stale_socket(socket_path)
+    servers = [_UnixServer(socket_path, daemon, log)]
+    os.chmod(socket_path, 0o600)
+    if listen is not None:
+        servers.append(_TcpServer(listen, daemon, log))
+
+    threads = [threading.Thread(target=daemon.refresh_forever, args=(log,), daemon=True)]
+    threads += [threading.Thread(target=server.serve_forever, daemon=True) for server in servers[1:]]
+    for thread in threads:
+        thread.start()
+
+    try:
+        servers[0].serve_forever()
+    finally:
+        daemon.stop()
+        for server in servers[1:]:
+            server.shutdown()
+        for server in servers:
+            server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
@@ -1,3 +1,4 @@
+from typing import Optional
 
 
 class MainError(Exception):
@@ -5,4 +6,44 @@ class MainError(Exception):
 
 
 class FileLoadError(MainError):
-    pass
\ No newline at end of file
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LuaSubsetError(MainError):
+    pass
+
+
+class LuaEvalError(MainError):
+    pass
+
+
+class LuaValueError(MainError):
+    pass
+
+
+class DepRuleError(MainError):
+    pass
+
+
+class RockspecError(MainError):
+    pass
+
+
+class RockFileError(MainError):
+    pass
+
+
+class PublishConflictError(MainError):
+    pass
+
+
+class QueryError(MainError):
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class DaemonError(MainError):
+    pass
@@ -0,0 +1,31 @@
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Union
+
+
+def atomic_write(file_path: str, content: bytes):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(content)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def sidecar_path(directory: str, suffix: str) -> str:
+    directory = os.path.abspath(directory)
+    return os.path.join(os.path.dirname(directory), f".{os.path.basename(directory)}.{suffix}")
+
+
+@contextmanager
+def map_file(file: BinaryIO) -> Iterator[Union[bytes, mmap.mmap]]:
+    if os.fstat(file.fileno()).st_size == 0:
+        yield b""
+        return
+
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+        yield content
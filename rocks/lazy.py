@@ -0,0 +1,16 @@
+import importlib
+import threading
+from functools import cache
+from types import ModuleType
+from typing import Callable
+
+_lock = threading.Lock()
+
+
+def lazy_import(name: str) -> Callable[[], ModuleType]:
+    @cache
+    def load() -> ModuleType:
+        with _lock:
+            return importlib.import_module(name)
+
+    return load
@@ -1,19 +1,117 @@
-import lupa.lua52 as lupa
+import threading
+from typing import Iterable, Optional
 
+from rocks import stats
+from rocks.errors import LuaEvalError, LuaValueError
+from rocks.lazy import lazy_import
 
-lua_type = lupa.lua_type
-interpretator = lupa.LuaRuntime()
+_lupa = lazy_import("lupa.lua52")
+_DATA_TYPES = (str, int, float, bool)
+_MAX_DEPTH = 64
 
 
-def table2dict(t) -> dict:
+def lua_type(value) -> Optional[str]:
+    return _lupa().lua_type(value)
+
+
+_SANDBOX = """
+local load, pairs, error, sethook = load, pairs, error, debug.sethook
+local builtins = {
+    assert = assert, error = error, ipairs = ipairs, next = next, pairs = pairs, select = select,
+    tonumber = tonumber, tostring = tostring, type = type, unpack = table.unpack,
+}
+local libraries = {string = string, table = table, math = math}
+
+local function limit()
+    error("instruction limit exceeded", 2)
+end
+
+return function(content, chunk_name, max_instructions)
+    local env = {}
+    for name, value in pairs(builtins) do
+        env[name] = value
+    end
+    for name, library in pairs(libraries) do
+        local copy = {}
+        for key, value in pairs(library) do
+            copy[key] = value
+        end
+        env[name] = copy
+    end
+
+    local chunk, message = load(content, chunk_name, "t", env)
+    if not chunk then
+        error(message, 0)
+    end
+
+    if max_instructions then
+        sethook(limit, "", max_instructions)
+    end
+    local ok, result = pcall(chunk)
+    sethook()
+    if not ok then
+        error(result, 0)
+    end
+    return env
+end
+"""
+
+
+class LuaSandbox:
+
+    def __init__(self):
+        self.runtime = _lupa().LuaRuntime()
+        self._evaluate = self.runtime.execute(_SANDBOX)
+
+    def evaluate(
+            self,
+            content: str,
+            names: Iterable[str],
+            chunk_name: str = "=content",
+            max_instructions: Optional[int] = 10_000_000,
+    ) -> dict:
+        try:
+            with stats.phase("lua"):
+                env = self._evaluate(content, chunk_name, max_instructions)
+        except _lupa().LuaError as e:
+            raise LuaEvalError(str(e).split("\nstack traceback:", 1)[0]) from None
+
+        values = {}
+        with stats.phase("convert"):
+            for name in names:
+                try:
+                    value = env[name]
+                    values[name] = table2dict(value, name) if lua_type(value) == "table" else value
+                except UnicodeDecodeError as e:
+                    raise LuaValueError(f"`{name}` has a string which is not valid utf-8: {e}") from None
+        return values
+
+
+_sandboxes = threading.local()
+
+
+def get_sandbox() -> LuaSandbox:
+    sandbox = getattr(_sandboxes, "sandbox", None)
+    if sandbox is None:
+        sandbox = _sandboxes.sandbox = LuaSandbox()
+    return sandbox
+
+
+def table2dict(t, path: str = "table", depth: int = 0) -> dict:
     if lua_type(t) != "table":
         raise Exception("not a lua table")
+    if depth > _MAX_DEPTH:
+        raise LuaValueError(f"`{path.split('.', 1)[0]}` is nested deeper than {_MAX_DEPTH} tables or refers to itself")
 
     data = {}
     for k, v in t.items():
+        if not isinstance(k, _DATA_TYPES):
+            raise LuaValueError(f"`{path}` has a {lua_type(k)} key, only strings and numbers are supported")
         if lua_type(v) == "table":
-            data[k] = table2dict(v)
-        else:
+            data[k] = table2dict(v, f"{path}.{k}", depth + 1)
+        elif isinstance(v, _DATA_TYPES):
             data[k] = v
+        else:
+            raise LuaValueError(f"`{path}.{k}` is a {lua_type(v)}, only plain data is supported")
 
     return data
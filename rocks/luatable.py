@@ -0,0 +1,303 @@
+import re
+from typing import Callable, Iterator, Optional, Union
+
+from rocks.errors import LuaSubsetError, LuaValueError
+
+_SKIP = rb"(?:\s+|--\[\[.*?\]\]|--\[=\[.*?\]=\]|--(?!\[=*\[)[^\n]*)*"
+_TOKEN = re.compile(_SKIP + rb"""(
+    \[\[.*?\]\]
+  | \[=\[.*?\]=\]
+  | [{}\[\]=,;]
+  | "(?:[^"\\\n]|\\z\s*|\\.)*"
+  | [A-Za-z_]\w*
+  | '(?:[^'\\\n]|\\z\s*|\\.)*'
+  | -?\s*(?:0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | \S
+  | \Z
+)""", re.S | re.X)
+_MULTILINE_MARKERS = (b"[[", b"[=", b"\\")
+_WINDOW = 1 << 16
+
+_ESCAPE = re.compile(rb"""\\(?:(\d{1,3})|x([0-9a-fA-F]{2})|z\s*|(.))""", re.S)
+_SIMPLE_ESCAPES = {
+    b"a": b"\a", b"b": b"\b", b"f": b"\f", b"n": b"\n", b"r": b"\r", b"t": b"\t", b"v": b"\v",
+    b"\\": b"\\", b'"': b'"', b"'": b"'", b"\n": b"\n",
+}
+_KEYWORDS = {b"true": True, b"false": False, b"nil": None}
+
+_OPEN, _CLOSE, _INDEX_OPEN = ord("{"), ord("}"), ord("[")
+_QUOTES = (ord('"'), ord("'"))
+_NAME_START = frozenset(b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_")
+_NUMBER_START = frozenset(b"0123456789-.")
+_SEPARATORS = (b",", b";")
+
+_KEY = rb'(?:\["([^"\\\n]*)"\]|([A-Za-z_]\w*))'
+_ARCH_ENTRY = rb'\{\s*arch\s*=\s*"[^"\\\n]*"\s*[,;]?\s*\}'
+_REPOSITORY = re.compile(rb"^repository\s*=\s*\{", re.M)
+_REPOSITORY_PACKAGE = re.compile(rb"\s*" + _KEY + rb"\s*=\s*\{")
+_REPOSITORY_VERSION = re.compile(
+    rb"\s*" + _KEY + rb"\s*=\s*\{\s*("
+    + _ARCH_ENTRY + rb"(?:\s*[,;]\s*" + _ARCH_ENTRY + rb")*(?:\s*[,;])?"
+    + rb")?\s*\}\s*([,;])?"
+)
+_REPOSITORY_ARCH = re.compile(rb'"([^"\\\n]*)"')
+_TABLE_END = re.compile(rb"\s*\}\s*([,;])?")
+_TABLE_CLOSE = re.compile(rb"\s*\}")
+
+LuaValue = Union[str, int, float, bool, None, dict]
+RepositoryArches = list[tuple[str, list[tuple[str, list[str]]]]]
+
+
+def _decode(raw: bytes) -> str:
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError as e:
+        raise LuaValueError(f"string is not valid utf-8: {e}") from None
+
+
+def _unescape(match: re.Match) -> bytes:
+    decimal, hexadecimal, char = match.groups()
+    if decimal is not None:
+        if int(decimal) > 255:
+            raise LuaSubsetError(f"decimal escape too large: \\{decimal.decode()}")
+        return bytes((int(decimal),))
+    if hexadecimal is not None:
+        return bytes((int(hexadecimal, 16),))
+    if char is None:
+        return b""
+    if char not in _SIMPLE_ESCAPES:
+        raise LuaSubsetError(f"invalid escape sequence: \\{char.decode(errors='replace')}")
+    return _SIMPLE_ESCAPES[char]
+
+
+def tokenize(content: bytes, position: int = 0, size: Optional[int] = None) -> Iterator[bytes]:
+    if size is None:
+        size = len(content)
+    while position < size:
+        end = content.find(b"\n", position + _WINDOW, size)
+        end = size if end == -1 else end + 1
+        if any(content.find(marker, position, end) != -1 for marker in _MULTILINE_MARKERS):
+            end = size
+
+        tokens = _TOKEN.findall(content, position, end)
+        while tokens and not tokens[-1]:
+            tokens.pop()
+        yield from tokens
+        position = end
+
+
+class _Parser:
+
+    def __init__(self, tokens: Iterator[bytes]):
+        self.strings: dict[bytes, str] = {}
+        self.tokens = tokens
+        self._next_token: Callable[[], bytes] = tokens.__next__
+
+    def _string(self, token: bytes) -> str:
+        value = self.strings.get(token)
+        if value is not None:
+            return value
+
+        first = token[0]
+        if first in _QUOTES:
+            value = token[1:-1]
+            if b"\\" in value:
+                value = _ESCAPE.sub(_unescape, value)
+            value = _decode(value)
+        elif first == _INDEX_OPEN:
+            level = token.index(b"[", 1) + 1
+            value = _decode(token[level:-level])
+            if value.startswith("\n"):
+                value = value[1:]
+        else:
+            value = _decode(token)
+
+        self.strings[token] = value
+        return value
+
+    def _value(self, token: bytes) -> LuaValue:
+        first = token[0]
+        if first == _OPEN:
+            return self._table()
+        if first in _QUOTES or (first == _INDEX_OPEN and len(token) > 1):
+            return self._string(token)
+        if first in _NAME_START:
+            if token in _KEYWORDS:
+                return _KEYWORDS[token]
+            raise LuaSubsetError(f"variable reference is not supported: {token.decode()}")
+        if first in _NUMBER_START:
+            text = re.sub(rb"\s", b"", token).decode("ascii")
+            try:
+                return int(text, 0) if text.lstrip("-")[:2] in ("0x", "0X") else int(text)
+            except ValueError:
+                try:
+                    return float(text)
+                except ValueError:
+                    pass
+
+        raise LuaSubsetError(f"unexpected token: {token!r}")
+
+    def _table(self) -> dict:
+        table = {}
+        position = 1
+        next_token = self._next_token
+        strings = self.strings
+        while True:
+            token = next_token()
+            first = token[0]
+            if first == _CLOSE:
+                return table
+
+            if token == b"[":
+                key = self._value(next_token())
+                if key is None:
+                    raise LuaSubsetError("table index is nil")
+                if next_token() != b"]":
+                    raise LuaSubsetError(f"expected ']' after table key {key!r}")
+                token = next_token()
+            elif first in _NAME_START and token not in _KEYWORDS:
+                key = strings.get(token) or self._string(token)
+                token = next_token()
+            else:
+                key = None
+
+            if key is None:
+                key = position
+                position += 1
+            elif token != b"=":
+                raise LuaSubsetError(f"expected '=' after table key {key!r}, got {token!r}")
+            else:
+                token = next_token()
+
+            first = token[0]
+            if first in _QUOTES:
+                value = strings.get(token) or self._string(token)
+            elif first == _OPEN:
+                value = self._table()
+            else:
+                value = self._value(token)
+
+            if value is not None:
+                table[key] = value
+
+            token = next_token()
+            if token == b"}":
+                return table
+            if token not in _SEPARATORS:
+                raise LuaSubsetError(f"expected ',' or '}}', got {token!r}")
+
+    def parse(self) -> dict[str, LuaValue]:
+        scope = {}
+        for token in self.tokens:
+            if token == b";":
+                continue
+            if token[0] not in _NAME_START or token in _KEYWORDS:
+                raise LuaSubsetError(f"assignment expected, got {token!r}")
+            name = self._string(token)
+            try:
+                if self._next_token() != b"=":
+                    raise LuaSubsetError(f"expected '=' after {name}")
+                scope[name] = self._value(self._next_token())
+            except StopIteration:
+                raise LuaSubsetError("unexpected end of content") from None
+
+        return scope
+
+
+def parse_assignments(content: Union[bytes, str]) -> dict[str, LuaValue]:
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+
+    return _Parser(tokenize(content)).parse()
+
+
+def _scan_repository(content: bytes, position: int) -> tuple[RepositoryArches, int]:
+    strings: dict[bytes, str] = {}
+
+    def key(match: re.Match) -> str:
+        raw = match.group(1)
+        if raw is None:
+            raw = match.group(2)
+            if raw in _KEYWORDS:
+                raise LuaSubsetError(f"unexpected keyword: {raw.decode()}")
+        value = strings.get(raw)
+        if value is None:
+            value = strings[raw] = _decode(raw)
+        return value
+
+    packages = []
+    separated = True
+    while True:
+        end = _TABLE_CLOSE.match(content, position)
+        if end is not None:
+            return packages, end.end()
+
+        package = _REPOSITORY_PACKAGE.match(content, position)
+        if package is None or not separated:
+            raise LuaSubsetError(f"unsupported repository entry at {position}")
+
+        versions = []
+        version_separated = True
+        position = package.end()
+        while True:
+            end = _TABLE_END.match(content, position)
+            if end is not None:
+                position = end.end()
+                separated = end.group(1) is not None
+                break
+
+            version = _REPOSITORY_VERSION.match(content, position)
+            if version is None or not version_separated:
+                raise LuaSubsetError(f"unsupported repository version entry at {position}")
+
+            arches = []
+            if version.group(3) is not None:
+                for raw in _REPOSITORY_ARCH.findall(version.group(3)):
+                    arch = strings.get(raw)
+                    if arch is None:
+                        arch = strings[raw] = _decode(raw)
+                    arches.append(arch)
+
+            versions.append((key(version), arches))
+            version_separated = version.group(4) is not None
+            position = version.end()
+
+        packages.append((key(package), versions))
+
+
+def _arches(repository: LuaValue) -> RepositoryArches:
+    if not isinstance(repository, dict):
+        raise LuaSubsetError("repository is not a table")
+
+    packages = []
+    for package_name, versions in repository.items():
+        if not isinstance(versions, dict):
+            raise LuaSubsetError(f"unsupported repository entry: {package_name}")
+        packages.append((package_name, [
+            (version, [entry.get("arch") for entry in entries.values() if isinstance(entry, dict)])
+            for version, entries in versions.items()
+            if isinstance(entries, dict)
+        ]))
+
+    return packages
+
+
+def parse_manifest(content: Union[bytes, str]) -> tuple[dict[str, LuaValue], RepositoryArches]:
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+
+    start = _REPOSITORY.search(content)
+    if start is None or any(content.find(marker) != -1 for marker in _MULTILINE_MARKERS):
+        scope = parse_assignments(content)
+        return scope, _arches(scope.pop("repository", {}))
+
+    try:
+        repository, end = _scan_repository(content, start.end())
+        scope = _Parser(tokenize(content, 0, start.start())).parse()
+        scope.update(_Parser(tokenize(content, end)).parse())
+    except LuaSubsetError:
+        scope = parse_assignments(content)
+        return scope, _arches(scope.pop("repository", {}))
+
+    scope.pop("repository", None)
+    return scope, repository
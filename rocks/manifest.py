@@ -1,11 +1,21 @@
-from bisect import bisect_left
-from copy import deepcopy
-from dataclasses import dataclass
-from typing import Optional, Union, Type, TypeVar, List
+import json
+import re
+import sys
+import threading
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from functools import lru_cache
+from operator import attrgetter
+from typing import AnyStr, Iterable, Optional, Union
 
 import semver
 
-from rocks.lua import interpretator
+from rocks import stats
+from rocks.errors import LuaSubsetError, LuaValueError
+from rocks.lua import get_sandbox
+from rocks.luatable import parse_manifest
+from rocks.search import SearchIndex
+from rocks.writer import render_manifest
 
 
 def index(a, x):
@@ -14,140 +24,307 @@ def index(a, x):
         return i
     raise ValueError
 
-T = TypeVar('T')
+_VERSION_DELTAS = {
+    "dev": 120000000,
+    "scm": 110000000,
+    "cvs": 100000000,
+    "rc": -1000,
+    "pre": -10000,
+    "beta": -100000,
+    "alpha": -1000000,
+}
+_VERSION_REVISION = re.compile(r"^(.*)-(\d+)$")
+_VERSION_NUMBER = re.compile(r"(\d+)[.\-_]*")
+_VERSION_WORD = re.compile(r"([A-Za-z]+)[.\-_]*")
+_KEY_WIDTH = 6
+_MAX_REVISION = sys.maxsize
+_MAIN_KEY = (_VERSION_DELTAS["cvs"],)
+
+
+@lru_cache(maxsize=1 << 16)
+def version_parts(version: str) -> tuple[tuple[Union[int, float], ...], Optional[int]]:
+    version = version.strip()
+    revision = None
+    match = _VERSION_REVISION.match(version)
+    if match is not None:
+        version, revision = match.group(1), int(match.group(2))
+
+    parts = []
+    word_slot = False
+    position = 0
+    while position < len(version):
+        match = _VERSION_NUMBER.match(version, position)
+        if match is not None:
+            number = int(match.group(1))
+            if word_slot:
+                parts[-1] += number / 100000
+            else:
+                parts.append(number)
+            word_slot = False
+        else:
+            match = _VERSION_WORD.match(version, position)
+            value = 0
+            if match is not None:
+                word = match.group(1)
+                value = _VERSION_DELTAS.get(word, ord(word[0]) / 1000)
+            if word_slot:
+                parts[-1] = value
+            else:
+                parts.append(value)
+            word_slot = True
+            if match is None:
+                break
+        position = match.end()
 
+    return tuple(parts), revision
 
-def get_closest_lower_version_than(a: List[T], x: T) -> T:
-    pos = bisect_left(a, x)
-    if pos != 0:
-        return a[pos - 1]
 
-    zero_version = a[pos]
-    if zero_version < x:
-        return zero_version
-    else:
-        return None
+def _pad(parts: tuple) -> tuple:
+    if len(parts) >= _KEY_WIDTH:
+        return parts
+    return parts + (0,) * (_KEY_WIDTH - len(parts))
 
 
-# def get_closest_greater_version_than(a: List[T], x: T) -> T:
-#     pos = bisect_left(a, x)
-#     if pos != len(a) - 1:
-#         return a[pos + 1]
-#
-#     last_version = a[pos]
-#     if last_version > x:
-#         return last_version
-#
-#     return None
+@lru_cache(maxsize=1 << 16)
+def version_key(version: str) -> tuple:
+    parts, revision = version_parts(version)
+    return _pad(parts) + (revision or 0,)
 
 
-def get_closest_lower_or_eq_version_than(a: List[T], x: T) -> T:
-    pos = bisect_left(a, x)
-    if a[pos] == x:
-        return a[pos]
+def is_release(version: str) -> bool:
+    return version_key(version) < _MAIN_KEY
 
-    if pos != 0:
-        return a[pos - 1]
 
-    zero_version = a[pos]
-    if zero_version <= x:
-        return zero_version
-    else:
-        return None
+@lru_cache(maxsize=1 << 16)
+def version_bounds(version: str) -> tuple[tuple, tuple]:
+    parts, revision = version_parts(version)
+    if revision is not None:
+        key = _pad(parts) + (revision,)
+        return key, key
+    return _pad(parts) + (-1,), _pad(parts) + (_MAX_REVISION,)
 
 
+@dataclass(frozen=True)
+class VersionRange:
+    low: Optional[tuple] = None
+    high: Optional[tuple] = None
+    low_inclusive: bool = True
+    high_inclusive: bool = True
+    excluded: frozenset[tuple[tuple, tuple]] = frozenset()
 
-class Version:
-    def __init__(self, name: str, arch: list = list):
-        self.name = name
-        self.arch = arch
-        self.is_main = name.startswith("scm")
+    @classmethod
+    def empty(cls) -> 'VersionRange':
+        return cls(high=(), high_inclusive=False)
 
-    def get_arch(self, arch: str) -> Optional[str]:
-        try:
-            return self.arch[index(self.arch, arch)]
-        except ValueError:
-            return None
+    @classmethod
+    def from_rule(cls, operator: str, version: str) -> 'VersionRange':
+        low, high = version_bounds(version)
+        if operator == "=" or operator == "==":
+            return cls(low, high)
+        elif operator == "~=":
+            return cls(excluded=frozenset(((low, high),)))
+        elif operator == "<":
+            return cls(high=low, high_inclusive=False)
+        elif operator == "<=":
+            return cls(high=high)
+        elif operator == ">":
+            return cls(low=high, low_inclusive=False)
+        elif operator == ">=":
+            return cls(low=low)
+        elif operator == "~>":
+            parts, _ = version_parts(version)
+            if not parts:
+                return cls(low=low)
+            return cls(low, _pad(parts[:-1] + (parts[-1] + 1,)) + (-1,), high_inclusive=False)
 
-    def has_arch(self, arch: str) -> bool:
-        try:
-            return index(self.arch, arch) >= 0
-        except ValueError:
+        return cls.empty()
+
+    @classmethod
+    def from_rules(cls, rules: Iterable[tuple[str, str]]) -> 'VersionRange':
+        result = cls()
+        for operator, version in rules:
+            result &= cls.from_rule(operator, version)
+        return result
+
+    def __and__(self, other: 'VersionRange') -> 'VersionRange':
+        low, low_inclusive = self.low, self.low_inclusive
+        if other.low is not None and (low is None or other.low > low or (other.low == low and not other.low_inclusive)):
+            low, low_inclusive = other.low, other.low_inclusive
+
+        high, high_inclusive = self.high, self.high_inclusive
+        if other.high is not None and (
+                high is None or other.high < high or (other.high == high and not other.high_inclusive)
+        ):
+            high, high_inclusive = other.high, other.high_inclusive
+
+        return VersionRange(low, high, low_inclusive, high_inclusive, self.excluded | other.excluded)
+
+    def is_excluded(self, key: tuple) -> bool:
+        for low, high in self.excluded:
+            if low <= key <= high:
+                return True
+        return False
+
+    def __contains__(self, key: tuple) -> bool:
+        if self.low is not None and (key < self.low if self.low_inclusive else key <= self.low):
+            return False
+        if self.high is not None and (key > self.high if self.high_inclusive else key >= self.high):
             return False
+        return not self.excluded or not self.is_excluded(key)
 
-    def __str__(self) -> str:
-        return self.name
+    def slice(self, keys: list[tuple]) -> tuple[int, int]:
+        if self.low is None:
+            start = 0
+        else:
+            start = bisect_left(keys, self.low) if self.low_inclusive else bisect_right(keys, self.low)
 
-    def __unicode__(self):
-        return self.name
+        if self.high is None:
+            end = len(keys)
+        else:
+            end = bisect_right(keys, self.high) if self.high_inclusive else bisect_left(keys, self.high)
 
-    def __hash__(self):
-        return hash(self.name)
+        return start, max(start, end)
 
-    def __lt__(self, obj: 'Version'):
-        if isinstance(obj, str):
-            obj = Version(obj)
-        if self.is_main and not obj.is_main:
-            return False
 
-        if not self.is_main and obj.is_main:
-            return True
+_RELEASES = VersionRange(high=_MAIN_KEY, high_inclusive=False)
 
-        return self.name < obj.name
 
-    def __gt__(self, obj: 'Version'):
-        if isinstance(obj, str):
-            obj = Version(obj)
+_arch_bits: dict[str, int] = {}
+_arch_names: list[str] = []
+_arch_lock = threading.Lock()
 
-        if self.is_main and not obj.is_main:
-            return True
 
-        if not self.is_main and obj.is_main:
-            return False
+def arch_bit(arch: str) -> int:
+    bit = _arch_bits.get(arch)
+    if bit is None:
+        with _arch_lock:
+            bit = _arch_bits.get(arch)
+            if bit is None:
+                _arch_names.append(sys.intern(arch))
+                bit = _arch_bits[_arch_names[-1]] = 1 << (len(_arch_names) - 1)
+    return bit
 
-        return self.name > obj.name
 
-    def __le__(self, obj: 'Version'):
-        if isinstance(obj, str):
-            obj = Version(obj)
+def arch_mask(arches: Iterable[str]) -> int:
+    mask = 0
+    for arch in arches:
+        mask |= arch_bit(arch)
+    return mask
 
-        if self.is_main and not obj.is_main:
-            return False
 
-        if not self.is_main and obj.is_main:
-            return True
+def arch_names(mask: int) -> list[str]:
+    names = []
+    position = 0
+    while mask:
+        if mask & 1:
+            names.append(_arch_names[position])
+        mask >>= 1
+        position += 1
+    return names
 
-        return self.name <= obj.name
 
-    def __ge__(self, obj: 'Version'):
-        if isinstance(obj, str):
-            obj = Version(obj)
+def _key_of(obj) -> Optional[tuple]:
+    if isinstance(obj, str):
+        return version_key(obj)
+    return getattr(obj, "key", None)
 
-        if self.is_main and not obj.is_main:
-            return True
 
-        if not self.is_main and obj.is_main:
-            return False
+class _VersionMixin:
+    __slots__ = ()
+
+    @property
+    def arch(self) -> list[str]:
+        return arch_names(self.arch_mask)
+
+    def get_arch(self, arch: str) -> Optional[str]:
+        bit = _arch_bits.get(arch)
+        if bit is None or not self.arch_mask & bit:
+            return None
+        return _arch_names[bit.bit_length() - 1]
+
+    def has_arch(self, arch: str) -> bool:
+        bit = _arch_bits.get(arch)
+        return bit is not None and self.arch_mask & bit != 0
+
+    def __getstate__(self):
+        return {slot: getattr(self, slot) for slot in self._state_slots if slot != "arch_mask"} | {
+            "arch": self.arch,
+        }
 
-        return self.name >= obj.name
+    def __setstate__(self, state: dict):
+        state = dict(state)
+        object.__setattr__(self, "arch_mask", arch_mask(state.pop("arch")))
+        for slot, value in state.items():
+            object.__setattr__(self, slot, value)
 
-    def __eq__(self, obj: 'Version'):
-        if isinstance(obj, str):
-            obj = Version(obj)
+    def __hash__(self):
+        return hash(self.key)
+
+    def __lt__(self, obj: Union['Version', str]):
+        key = _key_of(obj)
+        return self.key < key if key is not None else NotImplemented
+
+    def __gt__(self, obj: Union['Version', str]):
+        key = _key_of(obj)
+        return self.key > key if key is not None else NotImplemented
+
+    def __le__(self, obj: Union['Version', str]):
+        key = _key_of(obj)
+        return self.key <= key if key is not None else NotImplemented
+
+    def __ge__(self, obj: Union['Version', str]):
+        key = _key_of(obj)
+        return self.key >= key if key is not None else NotImplemented
+
+    def __eq__(self, obj: Union['Version', str]):
+        key = _key_of(obj)
+        return self.key == key if key is not None else NotImplemented
 
-        return self.name == obj.name
 
+class Version(_VersionMixin):
+    __slots__ = ("name", "arch_mask", "key")
+    _state_slots = __slots__
 
-class SemanticVersion(semver.Version):
+    def __init__(self, name: str, arch: Iterable[str] = ()):
+        self.name = sys.intern(name)
+        self.arch_mask = arch_mask(arch)
+        self.key = version_key(self.name)
+
+    @property
+    def is_main(self) -> bool:
+        return self.name.startswith("scm")
+
+    def __str__(self) -> str:
+        return self.name
 
-    def __init__(self, name: str, arch: list = list, semv: Optional[semver.Version] = None):
-        self.arch = arch
+    def __unicode__(self):
+        return self.name
+
+
+@lru_cache(maxsize=1 << 16)
+def parse_semver(name: str) -> tuple:
+    return semver.Version.parse(name, True).to_tuple()
+
+
+class SemanticVersion(_VersionMixin, semver.Version):
+    __slots__ = ("arch_mask", "key")
+    _state_slots = semver.Version.__slots__ + __slots__
+
+    def __init__(self, name: str, arch: Iterable[str] = (), semv: Optional[semver.Version] = None):
+        self.arch_mask = arch_mask(arch)
         if semv is not None:
-            self.name = str(semv)
             super().__init__(*semv.to_tuple())
+            self.key = version_key(str(semv))
         else:
-            self.name = name
-            super().__init__(*semver.Version.parse(name, True).to_tuple())
+            super().__init__(*parse_semver(name))
+            self.key = version_key(name)
+
+    @property
+    def name(self) -> str:
+        return semver.Version.__str__(self)
+
+    def replace(self, **parts) -> "SemanticVersion":
+        return type(self)(name="", arch=self.arch, semv=semver.Version(*self.to_tuple()).replace(**parts))
 
     def bump_major(self) -> "SemanticVersion":
         return type(self)(name="", arch=self.arch, semv=semver.Version(self.major + 1))
@@ -183,43 +360,25 @@ class SemanticVersion(semver.Version):
         else:
             build = str(token) + ".0"
 
-        # self._build or (token or "build") + ".0"
-        build = cls._increment_string(build)
-        if self._build is not None:
-            build = self._build
-        elif token == "":
-            build = "0"
-        elif token is None:
-            build = "build.0"
-        else:
-            build = str(token) + ".0"
-
         # self._build or (token or "build") + ".0"
         build = cls._increment_string(build)
         return cls(name="", arch=self.arch, semv=semver.Version(
             self.major, self.minor, self.patch, self.prerelease, build
         ))
 
-    def get_arch(self, arch: str) -> Optional[str]:
-        try:
-            return self.arch[index(self.arch, arch)]
-        except ValueError:
-            return None
-
-    def has_arch(self, arch: str) -> bool:
-        try:
-            return index(self.arch, arch) >= 0
-        except ValueError:
-            return False
-
     def __str__(self) -> str:
         return f'{self.major}.{self.minor}.{self.patch}'
 
     def __unicode__(self):
         return str(self)
 
-    def __hash__(self):
-        return hash(str(self))
+    __hash__ = _VersionMixin.__hash__
+
+
+def make_version(name: str, arches: Iterable[str] = ()) -> Union[SemanticVersion, Version]:
+    if len(name) != 0 and semver.Version.is_valid(name):
+        return SemanticVersion(name, arches)
+    return Version(name, arches)
 
 
 def version_from_string(version: str) -> Union[SemanticVersion, Version]:
@@ -238,28 +397,80 @@ def version_from_string(version: str) -> Union[SemanticVersion, Version]:
 
 
 class Package:
+    __slots__ = ("name", "semver_versions", "other_versions", "semver_keys", "other_keys", "rendered")
 
     def __init__(self, name: str):
-        self.name = name
+        self.name = sys.intern(name)
         self.semver_versions = []
         self.other_versions = []
+        self.semver_keys = []
+        self.other_keys = []
+        self.rendered: Optional[str] = None
+
+    def sort(self):
+        self.semver_versions.sort(key=attrgetter("key"))
+        self.other_versions.sort(key=attrgetter("key"))
+        self.semver_keys = [version.key for version in self.semver_versions]
+        self.other_keys = [version.key for version in self.other_versions]
+
+    def _position(self, name: str) -> tuple[list[tuple], list, int]:
+        key = version_key(name)
+        for keys, versions in self._lists():
+            position = bisect_left(keys, key)
+            while position < len(keys) and keys[position] == key:
+                if versions[position].name == name:
+                    return keys, versions, position
+                position += 1
+        return [], [], -1
+
+    def find_version(self, name: str) -> Optional[Union[Version, SemanticVersion]]:
+        _, versions, position = self._position(name)
+        return versions[position] if position >= 0 else None
+
+    def add_version(self, name: str, arches: Iterable[str] = ()) -> Union[Version, SemanticVersion]:
+        self.rendered = None
+        version = self.find_version(name)
+        if version is not None:
+            version.arch_mask |= arch_mask(arches)
+            return version
 
-    def get_version_by_rule(self, operator: str, version: Union) -> Optional[Union[Version, SemanticVersion]]:
-        if operator == "=" or operator == "==":
-            version = self.get_version(version)
-        elif operator == "<":
-            version = self.get_lower_version(version)
-        elif operator == "<=":
-            version = self.get_lower_or_eq_version(version)
-        elif operator == ">":
-            version = self.get_greater_version(version)
-        elif operator == ">=":
-            version = self.get_greater_or_eq_version(version)
-        elif operator == "~>":
-            version = self.get_pessimistic_version(version)
+        version = make_version(name, arches)
+        if isinstance(version, SemanticVersion):
+            keys, versions = self.semver_keys, self.semver_versions
+        else:
+            keys, versions = self.other_keys, self.other_versions
+        position = bisect_right(keys, version.key)
+        keys.insert(position, version.key)
+        versions.insert(position, version)
+        return version
+
+    def remove_version(self, name: str) -> Optional[Union[Version, SemanticVersion]]:
+        keys, versions, position = self._position(name)
+        if position < 0:
+            return None
 
+        self.rendered = None
+        del keys[position]
+        return versions.pop(position)
+
+    def remove_arch(self, name: str, arch: str) -> Optional[Union[Version, SemanticVersion]]:
+        version = self.find_version(name)
+        if version is None or not version.has_arch(arch):
+            return None
+
+        self.rendered = None
+        version.arch_mask &= ~arch_bit(arch)
         return version
 
+    def get_version_by_rule(self, operator: str, version: str) -> Optional[Union[Version, SemanticVersion]]:
+        return self.best_in(VersionRange.from_rule(operator, version))
+
+    def get_version_by_rules(self, rules: Iterable[tuple[str, str]]) -> Optional[Union[Version, SemanticVersion]]:
+        return self.best_in(VersionRange.from_rules(rules))
+
+    def get_versions_by_rules(self, rules: Iterable[tuple[str, str]]) -> list[Union[Version, SemanticVersion]]:
+        return self.all_in(VersionRange.from_rules(rules))
+
     @property
     def latest_scm(self) -> Optional[Version]:
         for version in reversed(self.other_versions):
@@ -275,76 +486,77 @@ class Package:
 
         return self.semver_versions[len(self.semver_versions) - 1]
 
-    def get_pessimistic_version(self, version: str) -> Optional[Union[Version, SemanticVersion]]:
-        version = version_from_string(version)
-        if not isinstance(version, SemanticVersion):
-            return None
-
-        if version.minor == 0:
-            border = version.bump_major()
-        else:
-            border = version.bump_minor()
-
-        max_found = version
-        for v in self.semver_versions:
-            if version <= v < border and v > max_found:
-                max_found = v
+    def _lists(self) -> tuple[tuple[list[tuple], list], ...]:
+        return (self.semver_keys, self.semver_versions), (self.other_keys, self.other_versions)
+
+    def highest_in(self, version_range: VersionRange) -> Optional[Union[Version, SemanticVersion]]:
+        found = None
+        for keys, versions in self._lists():
+            start, end = version_range.slice(keys)
+            for position in range(end - 1, start - 1, -1):
+                if found is not None and keys[position] <= found.key:
+                    break
+                if not version_range.excluded or not version_range.is_excluded(keys[position]):
+                    found = versions[position]
+                    break
+
+        return found
+
+    def best_in(self, version_range: VersionRange) -> Optional[Union[Version, SemanticVersion]]:
+        if version_range.high is not None:
+            return self.highest_in(version_range)
+
+        release = self.highest_in(version_range & _RELEASES)
+        if release is not None:
+            return release
+
+        start, end = version_range.slice(self.other_keys)
+        for position in range(end - 1, start - 1, -1):
+            version = self.other_versions[position]
+            if version.name.startswith("scm") and not version_range.is_excluded(version.key):
+                return version
+
+        return self.highest_in(version_range)
+
+    def all_in(self, version_range: VersionRange) -> list[Union[Version, SemanticVersion]]:
+        found = []
+        for keys, versions in self._lists():
+            start, end = version_range.slice(keys)
+            found.extend(
+                version for version in versions[start:end]
+                if not version_range.excluded or not version_range.is_excluded(version.key)
+            )
+
+        return sorted(found, key=attrgetter("key"))
+
+    def candidates_in(self, version_range: VersionRange) -> list[Union[Version, SemanticVersion]]:
+        versions = self.all_in(version_range)
+        versions.reverse()
+        if version_range.high is not None:
+            return versions
+
+        releases = [version for version in versions if version.key < _MAIN_KEY]
+        scm = [version for version in versions if version.key >= _MAIN_KEY and version.name.startswith("scm")]
+        rest = [version for version in versions if version.key >= _MAIN_KEY and not version.name.startswith("scm")]
+        return releases + scm + rest
 
-        return max_found
+    def get_pessimistic_version(self, version: str) -> Optional[Union[Version, SemanticVersion]]:
+        return self.get_version_by_rule("~>", version)
 
     def get_greater_version(self, version: str) -> Optional[Union[Version, SemanticVersion]]:
-        version = version_from_string(version)
-        if version is None:
-            return None
-
-        if isinstance(version, SemanticVersion):
-            return self.latest_semver if (self.latest_semver > version and
-                                          self.latest_semver is None) else self.latest_scm
-
-        return self.latest_scm if self.latest_scm > version and self.latest_scm is None else None
+        return self.get_version_by_rule(">", version)
 
     def get_greater_or_eq_version(self, version: str) -> Optional[Union[Version, SemanticVersion]]:
-        version = version_from_string(version)
-        if version is None:
-            return None
-
-        if isinstance(version, SemanticVersion):
-            return self.latest_semver if (self.latest_semver is not None and
-                                          self.latest_semver >= version) else self.latest_scm
-
-        return self.latest_scm if self.latest_scm is not None and self.latest_scm >= version else None
+        return self.get_version_by_rule(">=", version)
 
     def get_lower_version(self, version: str) -> Optional[Union[Version, SemanticVersion]]:
-        version = version_from_string(version)
-        if version is None:
-            return None
-
-        if isinstance(version, SemanticVersion):
-            return get_closest_lower_version_than(self.semver_versions, version)
-
-        return get_closest_lower_version_than(self.other_versions, version)
+        return self.get_version_by_rule("<", version)
 
     def get_lower_or_eq_version(self, version: str) -> Optional[Union[Version, SemanticVersion]]:
-        version = version_from_string(version)
-        if version is None:
-            return None
-
-        if isinstance(version, SemanticVersion):
-            return get_closest_lower_or_eq_version_than(self.semver_versions, version)
-
-        return get_closest_lower_or_eq_version_than(self.other_versions, version)
+        return self.get_version_by_rule("<=", version)
 
     def get_version(self, version: str) -> Optional[Union[Version, SemanticVersion]]:
-        try:
-            if version.find("-") == -1:
-                version += "-1"
-
-            return self.semver_versions[index(self.semver_versions, SemanticVersion(version))]
-        except ValueError:
-            try:
-                return self.other_versions[index(self.other_versions, version)]
-            except ValueError:
-                return None
+        return self.get_version_by_rule("==", version)
 
     def __str__(self) -> str:
         return self.name
@@ -374,11 +586,23 @@ class Package:
         return self.name == str(obj)
 
 
+def _drop(providers: Union[dict, list], provider: str) -> Optional[Union[dict, list]]:
+    values = list(providers.values()) if isinstance(providers, dict) else list(providers)
+    if provider not in values:
+        return None
+
+    values = [value for value in values if value != provider]
+    if isinstance(providers, dict):
+        return {position: value for position, value in enumerate(values, 1)}
+    return values
+
+
 @dataclass
 class Manifest:
     commands: dict
     modules: dict
     packages: list[Package]
+    _search_index: Optional[SearchIndex] = field(default=None, repr=False, compare=False)
 
     def search(self, package_name: str) -> Optional[Package]:
         try:
@@ -386,32 +610,159 @@ class Manifest:
         except ValueError:
             return None
 
-    @classmethod
-    def from_lua_str(cls, content: str) -> 'Manifest':
-        manifest_data = interpretator.execute(
-            "do " + content + " ;return {commands = commands, modules = modules, packages = repository} end"
-        )
-        packages = []
-        for package_name, package_meta in manifest_data.packages.items():
-            package = Package(name=package_name)
-            for package_version, version_meta in package_meta.items():
-                arches = [e.arch for e in version_meta.values()]
+    @property
+    def search_index(self) -> SearchIndex:
+        if self._search_index is None:
+            with stats.phase("index"):
+                self._search_index = SearchIndex.from_names(package.name for package in self.packages)
+        return self._search_index
+
+    def find(self, pattern: str) -> list[Package]:
+        return [self.packages[position] for position in self.search_index.glob(pattern)]
+
+    def similar(self, package_name: str, limit: int = 10) -> list[Package]:
+        return [self.packages[position] for position, _ in self.search_index.fuzzy(package_name, limit)]
+
+    def _package(self, package_name: str, create: bool = False) -> Optional[Package]:
+        position = bisect_left(self.packages, package_name)
+        if position < len(self.packages) and self.packages[position].name == package_name:
+            return self.packages[position]
+        if not create:
+            return None
 
-                if len(package_version) != 0 and semver.Version.is_valid(package_version):
-                    package.semver_versions.append(
-                        SemanticVersion(package_version, arches)
-                    )
+        package = Package(package_name)
+        self.packages.insert(position, package)
+        self._search_index = None
+        return package
+
+    def add_version(
+            self,
+            package_name: str,
+            version: str,
+            arches: Iterable[str] = ("rockspec",),
+    ) -> Union[Version, SemanticVersion]:
+        return self._package(package_name, create=True).add_version(version, arches)
+
+    def add_arch(self, package_name: str, version: str, arch: str) -> Union[Version, SemanticVersion]:
+        return self.add_version(package_name, version, (arch,))
+
+    def remove_version(self, package_name: str, version: str) -> bool:
+        package = self._package(package_name)
+        if package is None or package.remove_version(version) is None:
+            return False
 
+        if not package.semver_versions and not package.other_versions:
+            del self.packages[bisect_left(self.packages, package_name)]
+            self._search_index = None
+
+        provider = f"{package_name}/{version}"
+        for table in (self.modules, self.commands):
+            for name in list(table):
+                providers = _drop(table[name], provider)
+                if providers is None:
+                    continue
+                if providers:
+                    table[name] = providers
                 else:
-                    package.other_versions.append(Version(package_version, arches))
+                    del table[name]
+
+        return True
+
+    def remove_arch(self, package_name: str, version: str, arch: str) -> bool:
+        package = self._package(package_name)
+        if package is None:
+            return False
 
-            package.semver_versions = sorted(package.semver_versions)
-            package.other_versions = sorted(package.other_versions)
-            packages.append(package)
-        packages.sort()
+        removed = package.remove_arch(version, arch)
+        if removed is None:
+            return False
+
+        if removed.arch_mask == 0:
+            self.remove_version(package_name, version)
+
+        return True
+
+    def to_lua_str(self) -> str:
+        return render_manifest(self)
+
+    @classmethod
+    def from_lua_str(cls, content: AnyStr) -> 'Manifest':
+        try:
+            with stats.phase("parse"):
+                scope, repository = parse_manifest(content)
+        except LuaSubsetError:
+            return cls.from_lua_runtime(content)
+
+        return cls.from_arches(scope.get("commands", {}), scope.get("modules", {}), repository)
+
+    @classmethod
+    def from_json(cls, content: AnyStr) -> 'Manifest':
+        with stats.phase("decode"):
+            data = json.loads(content)
+        return cls.from_arches(
+            data.get("commands", {}),
+            data.get("modules", {}),
+            (
+                (package_name, (
+                    (package_version, [e["arch"] for e in version_meta])
+                    for package_version, version_meta in package_meta.items()
+                ))
+                for package_name, package_meta in data.get("repository", {}).items()
+            ),
+        )
+
+    @classmethod
+    def from_lua_runtime(cls, content: AnyStr) -> 'Manifest':
+        if not isinstance(content, str):
+            try:
+                content = bytes(content).decode("utf-8")
+            except UnicodeDecodeError as e:
+                raise LuaValueError(f"manifest is not valid utf-8: {e}") from None
+
+        manifest_data = get_sandbox().evaluate(
+            content,
+            ("commands", "modules", "repository"),
+            chunk_name="=manifest",
+            max_instructions=None,
+        )
+        return cls.from_arches(
+            manifest_data["commands"] or {},
+            manifest_data["modules"] or {},
+            (
+                (package_name, (
+                    (package_version, [e["arch"] for e in version_meta.values()])
+                    for package_version, version_meta in package_meta.items()
+                ))
+                for package_name, package_meta in (manifest_data["repository"] or {}).items()
+            ),
+        )
+
+    @classmethod
+    def from_arches(
+            cls,
+            commands: dict,
+            modules: dict,
+            repository: Iterable[tuple[str, Iterable[tuple[str, list[str]]]]],
+    ) -> 'Manifest':
+        packages = []
+        with stats.phase("build"):
+            for package_name, package_versions in repository:
+                package = Package(name=package_name)
+                for package_version, arches in package_versions:
+                    version = make_version(package_version, arches)
+                    if isinstance(version, SemanticVersion):
+                        package.semver_versions.append(version)
+                    else:
+                        package.other_versions.append(version)
+                packages.append(package)
+
+        with stats.phase("sort"):
+            for package in packages:
+                package.sort()
+            packages.sort()
 
         return cls(
-            commands=dict(manifest_data.commands),
-            modules=dict(manifest_data.modules),
+            commands=commands,
+            modules=modules,
             packages=packages
-        )
\ No newline at end of file
+        )
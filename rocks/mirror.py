@@ -0,0 +1,150 @@
+import http
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from rocks.audit import manifest_files
+from rocks.backend import LocalBackend
+from rocks.errors import FileLoadError
+from rocks.files import atomic_write, sidecar_path
+from rocks.lazy import lazy_import
+from rocks.manifest import Manifest, is_release
+from rocks.server import RockServer
+
+_requests = lazy_import("requests")
+
+
+@dataclass
+class MirrorPlan:
+    manifest_name: str
+    manifest_content: bytes
+    added: list[str]
+    removed: list[str]
+    fetch: list[str]
+    refresh: list[str] = field(default_factory=list)
+
+
+@dataclass
+class MirrorResult:
+    fetched: list[str] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+    failed: dict[str, str] = field(default_factory=dict)
+    pruned: list[str] = field(default_factory=list)
+    published: bool = False
+
+
+class Mirror:
+
+    def __init__(self, source: RockServer, directory: str, workers: Optional[int] = None):
+        self.source = source
+        self.directory = directory
+        self.workers = workers or source.pool_size
+        self.state_path = sidecar_path(directory, "mirror")
+        os.makedirs(directory, exist_ok=True)
+        self.validators = self._load_validators()
+
+    def _load_validators(self) -> dict[str, dict[str, str]]:
+        try:
+            with open(self.state_path) as state:
+                validators = json.load(state)
+        except (FileNotFoundError, ValueError):
+            return {}
+        return validators if isinstance(validators, dict) else {}
+
+    def _save_validators(self):
+        atomic_write(self.state_path, json.dumps(self.validators, sort_keys=True).encode("utf-8"))
+
+    def _mirrored_manifest(self, name: str) -> Optional[Manifest]:
+        mirrored = RockServer(self.directory, backend=LocalBackend(self.directory))
+        try:
+            with mirrored.backend.mapped(name) as content:
+                return mirrored.load_manifest(name, content)
+        except FileLoadError as e:
+            if e.status_code != http.HTTPStatus.NOT_FOUND:
+                raise
+            return None
+
+    def plan(self, revalidate: bool = False) -> MirrorPlan:
+        name, content = self.source.get_manifest_file()
+        files = list(manifest_files(self.source.load_manifest(name, content)))
+        wanted = {file_name for *_, file_name in files}
+
+        mirrored = self._mirrored_manifest(name)
+        current = set() if mirrored is None else {file_name for *_, file_name in manifest_files(mirrored)}
+        on_disk = LocalBackend(self.directory).listing()
+
+        return MirrorPlan(
+            manifest_name=name,
+            manifest_content=content,
+            added=sorted(wanted - current),
+            removed=sorted(current - wanted),
+            fetch=sorted(file_name for file_name in wanted if file_name not in on_disk),
+            refresh=sorted(
+                file_name for _, version, _, file_name in files
+                if file_name in on_disk and (revalidate or not is_release(version))
+            ),
+        )
+
+    def _download(self, name: str, refresh: bool = False) -> bool:
+        file_path = os.path.join(self.directory, name)
+        fetched = self.source.backend.fetch(name, self.validators.get(name) if refresh else None)
+        if fetched.status_code == http.HTTPStatus.NOT_MODIFIED:
+            return False
+        if refresh and name not in self.validators:
+            with open(file_path, "rb") as current:
+                if current.read() == fetched.content:
+                    return False
+
+        atomic_write(file_path, fetched.content)
+        if fetched.headers.get("ETag"):
+            self.validators[name] = {"If-None-Match": fetched.headers["ETag"]}
+        elif fetched.headers.get("Last-Modified"):
+            self.validators[name] = {"If-Modified-Since": fetched.headers["Last-Modified"]}
+        else:
+            self.validators.pop(name, None)
+        return True
+
+    def run(
+            self,
+            plan: MirrorPlan,
+            prune: bool = False,
+            progress: Optional[Callable[[str, Optional[str]], None]] = None,
+    ) -> MirrorResult:
+        result = MirrorResult()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._download, name): name for name in plan.fetch}
+            futures.update({executor.submit(self._download, name, True): name for name in plan.refresh})
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    changed = future.result()
+                except (FileLoadError, _requests().RequestException, OSError) as e:
+                    result.failed[name] = str(e)
+                else:
+                    if not changed:
+                        result.unchanged.append(name)
+                        continue
+                    result.fetched.append(name)
+                if progress is not None:
+                    progress(name, result.failed.get(name))
+
+        self._save_validators()
+        if result.failed:
+            return result
+
+        atomic_write(os.path.join(self.directory, plan.manifest_name), plan.manifest_content)
+        result.published = True
+
+        if prune:
+            for name in plan.removed:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                self.validators.pop(name, None)
+                result.pruned.append(name)
+            self._save_validators()
+
+        return result
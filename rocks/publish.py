@@ -0,0 +1,163 @@
+import http
+import os
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+from rocks.backend import Backend
+from rocks.errors import FileLoadError, MainError, PublishConflictError, RockFileError
+from rocks.lazy import lazy_import
+from rocks.manifest import Manifest
+from rocks.rockspec import parse_many
+
+_requests = lazy_import("requests")
+
+ROCKSPEC = "rockspec"
+_MANIFEST_VARIANTS = ("manifest.zip", "manifest.json") + tuple(
+    f"manifest-{lua_version}{suffix}"
+    for lua_version in ("5.1", "5.2", "5.3", "5.4")
+    for suffix in ("", ".zip", ".json")
+)
+_ROCK_FILE = re.compile(r"^(?P<package>.+)-(?P<version>[^-]+-\d+)\.(?:(?P<arch>[^.]+)\.rock|rockspec)$")
+
+
+@dataclass
+class RockFile:
+    path: str
+    package: str
+    version: str
+    arch: str
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+    @classmethod
+    def from_path(cls, file_path: str) -> 'RockFile':
+        match = _ROCK_FILE.match(os.path.basename(file_path))
+        if match is None:
+            raise RockFileError(f"not a rock or rockspec file name: {file_path}")
+        return cls(file_path, match.group("package"), match.group("version"), match.group("arch") or ROCKSPEC)
+
+
+@dataclass
+class PublishResult:
+    manifest: Optional[Manifest] = None
+    transferred: list[str] = field(default_factory=list)
+    failed: dict[str, str] = field(default_factory=dict)
+    dropped: list[str] = field(default_factory=list)
+    attempts: int = 0
+
+
+def describe(paths: Iterable[str], workers: Optional[int] = None) -> list[RockFile]:
+    files = [RockFile.from_path(file_path) for file_path in paths]
+    rockspecs = [rock for rock in files if rock.arch == ROCKSPEC]
+    contents = []
+    for rock in rockspecs:
+        with open(rock.path, "rb") as rockspec_file:
+            contents.append(rockspec_file.read())
+
+    for rock, spec in zip(rockspecs, parse_many(contents, workers)):
+        if isinstance(spec, MainError):
+            raise RockFileError(f"{rock.name}: {spec}")
+        if (spec.package, spec.version) != (rock.package, rock.version):
+            raise RockFileError(f"{rock.name} describes {spec.package} {spec.version}")
+
+    return files
+
+
+class Publisher:
+
+    def __init__(
+            self,
+            target: Backend,
+            workers: int = 10,
+            attempts: int = 8,
+            manifest_name: str = "manifest",
+    ):
+        self.target = target
+        self.workers = workers
+        self.attempts = attempts
+        self.manifest_name = manifest_name
+
+    def _each(self, action: Callable[[RockFile], None], files: list[RockFile], result: PublishResult):
+        def run(rock: RockFile) -> Optional[str]:
+            try:
+                action(rock)
+            except (FileLoadError, _requests().RequestException, OSError) as e:
+                return str(e)
+            return None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for rock, error in zip(files, executor.map(run, files)):
+                if error is None:
+                    result.transferred.append(rock.name)
+                else:
+                    result.failed[rock.name] = error
+
+    def _put(self, rock: RockFile):
+        with open(rock.path, "rb") as rock_file:
+            self.target.put(rock.name, rock_file.read())
+
+    def publish(self, patch: Callable[[Manifest], None], result: PublishResult):
+        for attempt in range(self.attempts):
+            result.attempts = attempt + 1
+            try:
+                content, tag = self.target.fetch_tagged(self.manifest_name)
+                man = Manifest.from_lua_str(content)
+            except FileLoadError as e:
+                if e.status_code != http.HTTPStatus.NOT_FOUND:
+                    raise
+                tag, man = None, Manifest(commands={}, modules={}, packages=[])
+
+            patch(man)
+            try:
+                self.target.swap(self.manifest_name, man.to_lua_str().encode("utf-8"), tag)
+            except PublishConflictError:
+                time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+                continue
+
+            result.manifest = man
+            self._drop_variants(result)
+            return
+
+        raise PublishConflictError(f"{self.manifest_name} kept changing, gave up after {self.attempts} attempts")
+
+    def _drop_variants(self, result: PublishResult):
+        if self.manifest_name != "manifest":
+            return
+
+        for name in _MANIFEST_VARIANTS:
+            try:
+                if self.target.exists(name):
+                    self.target.delete(name)
+                    result.dropped.append(name)
+            except (FileLoadError, _requests().RequestException, OSError) as e:
+                result.failed[name] = str(e)
+
+    def upload(self, files: list[RockFile]) -> PublishResult:
+        result = PublishResult()
+        self._each(self._put, files, result)
+        if result.failed:
+            return result
+
+        def patch(man: Manifest):
+            for rock in files:
+                man.add_arch(rock.package, rock.version, rock.arch)
+
+        self.publish(patch, result)
+        return result
+
+    def remove(self, files: list[RockFile]) -> PublishResult:
+        result = PublishResult()
+
+        def patch(man: Manifest):
+            for rock in files:
+                man.remove_arch(rock.package, rock.version, rock.arch)
+
+        self.publish(patch, result)
+        self._each(lambda rock: self.target.delete(rock.name), files, result)
+        return result
@@ -0,0 +1,70 @@
+import http
+from typing import Optional, Union
+
+from rocks.errors import QueryError
+from rocks.manifest import Manifest, Package, SemanticVersion, Version
+from rocks.search import is_pattern
+from rocks.tree import DepNode
+
+EXCLUDED = ("tarantool", "lua")
+SUGGESTIONS = 5
+
+
+def version_json(version: Union[Version, SemanticVersion]) -> dict:
+    return {"name": version.name, "display": str(version), "arch": list(version.arch)}
+
+
+def package_json(package: Package) -> dict:
+    return {
+        "name": package.name,
+        "versions": [version_json(version) for version in (*package.other_versions, *package.semver_versions)],
+    }
+
+
+def node_json(node: DepNode) -> dict:
+    return {
+        "rule": str(node.rule),
+        "status": node.status,
+        "error": node.error,
+        "version": None if node.version is None else node.version.name,
+        "has_arch": node.has_arch,
+        "has_arch_file": node.has_arch_file,
+        "children": [node_json(child) for child in node.children],
+    }
+
+
+def find_packages(man: Manifest, package_name: str = "") -> dict:
+    if package_name == "":
+        return {"packages": [package_json(package) for package in man.packages], "suggestions": []}
+
+    if is_pattern(package_name):
+        return {"packages": [package_json(package) for package in man.find(package_name)], "suggestions": []}
+
+    package = man.search(package_name)
+    if package is None:
+        return {"packages": [], "suggestions": [package.name for package in man.similar(package_name, SUGGESTIONS)]}
+    return {"packages": [package_json(package)], "suggestions": []}
+
+
+def latest_version(package: Package) -> Optional[Union[Version, SemanticVersion]]:
+    return package.latest_scm or package.latest_semver
+
+
+def select_rockspec(man: Manifest, query: str) -> tuple[Package, Union[Version, SemanticVersion]]:
+    package_name, _, version_name = query.partition("@")
+    package = man.search(package_name)
+    if package is None:
+        raise QueryError(f"not found: {package_name}", http.HTTPStatus.NOT_FOUND)
+
+    if version_name:
+        version = package.get_version(version_name)
+        if version is None:
+            raise QueryError(f"version not found: {version_name}", http.HTTPStatus.NOT_FOUND)
+    else:
+        version = latest_version(package)
+        if version is None:
+            raise QueryError("unable to find any latest version", http.HTTPStatus.NOT_FOUND)
+
+    if not version.get_arch("rockspec"):
+        raise QueryError(f"version {version.name}: has no `rockspec` arch", http.HTTPStatus.NOT_FOUND)
+    return package, version
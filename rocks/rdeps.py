@@ -0,0 +1,206 @@
+import hashlib
+import os
+import pickle
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from rocks import stats
+from rocks.errors import FileLoadError, MainError
+from rocks.files import atomic_write
+from rocks.manifest import Manifest, VersionRange, is_release, version_key
+from rocks.rockspec import DepRule, parse_many
+from rocks.server import RockServer
+
+MAGIC = b"ROCKRDEP"
+FORMAT_VERSION = 3
+
+
+def default_index_path(address: str, lua_version: Optional[str] = None, directory: Optional[str] = None) -> str:
+    if directory is None:
+        directory = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "rocks-admin")
+    key = hashlib.sha1(f"{address}|{lua_version or ''}".encode("utf-8")).hexdigest()[:12]
+    return os.path.join(directory, f"rdeps-{key}.index")
+
+
+def wanted_rockspecs(man: Manifest, every: bool = False) -> dict[str, tuple[str, str]]:
+    wanted = {}
+    for package in man.packages:
+        if every:
+            versions = [*package.other_versions, *package.semver_versions]
+        else:
+            versions = package.candidates_in(VersionRange())
+        versions = [version for version in versions if version.has_arch("rockspec")]
+
+        for version in versions if every else versions[:1]:
+            wanted[f"{package.name}-{version.name}.rockspec"] = (package.name, version.name)
+    return wanted
+
+
+@dataclass
+class Dependent:
+    package: str
+    version: str
+    rule: DepRule
+
+
+@dataclass
+class RdepNode:
+    dependent: Dependent
+    versions: list[str]
+    children: list['RdepNode'] = field(default_factory=list)
+
+
+@dataclass
+class RdepsUpdate:
+    added: int = 0
+    refreshed: int = 0
+    removed: int = 0
+    broken: list[str] = field(default_factory=list)
+    failed: list[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.refreshed or self.removed or self.failed)
+
+
+class RdepsIndex:
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.digest: Optional[str] = None
+        self.every = False
+        self.rockspecs: dict[str, Optional[tuple[str, str, list[DepRule]]]] = {}
+        self.versions: dict[str, list[str]] = {}
+        self._dependents: Optional[dict[str, list[Dependent]]] = None
+
+    @classmethod
+    def open(cls, path: str) -> 'RdepsIndex':
+        index = cls(path)
+        try:
+            with open(path, "rb") as index_file:
+                if index_file.read(len(MAGIC) + 2) != MAGIC + FORMAT_VERSION.to_bytes(2, "big"):
+                    return index
+                index.digest, index.every, index.rockspecs, index.versions = pickle.load(index_file)
+        except FileNotFoundError:
+            return index
+        except (ValueError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError):
+            return cls(path)
+        return index
+
+    def save(self):
+        if self.path is None:
+            return
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        atomic_write(self.path, MAGIC + FORMAT_VERSION.to_bytes(2, "big") + pickle.dumps(
+            (self.digest, self.every, self.rockspecs, self.versions), protocol=pickle.HIGHEST_PROTOCOL,
+        ))
+
+    def update(self, server: RockServer, every: bool = False, batch_size: int = 512) -> RdepsUpdate:
+        name, content = server.get_manifest_file()
+        digest = hashlib.sha256(content).hexdigest()
+        if digest == self.digest and every == self.every:
+            stats.cache("rdeps", "hit", len(self.rockspecs))
+            return RdepsUpdate()
+
+        man = server.load_manifest(name, content)
+        wanted = wanted_rockspecs(man, every)
+        result = RdepsUpdate()
+        for rockspec_name in [rockspec_name for rockspec_name in self.rockspecs if rockspec_name not in wanted]:
+            del self.rockspecs[rockspec_name]
+            result.removed += 1
+
+        self.digest, self.every, self._dependents = None, every, None
+        self.versions = {
+            package.name: [version.name for version in (*package.other_versions, *package.semver_versions)]
+            for package in man.packages
+        }
+        missing = [
+            rockspec_name for rockspec_name, (_, version) in wanted.items()
+            if rockspec_name not in self.rockspecs or not is_release(version)
+        ]
+        stats.cache("rdeps", "hit", len(wanted) - len(missing))
+        stats.cache("rdeps", "miss", len(missing))
+
+        for start in range(0, len(missing), batch_size):
+            contents = server.get_many(missing[start:start + batch_size])
+            fetched = []
+            for rockspec_name, content in contents.items():
+                if content is None or isinstance(content, FileLoadError):
+                    result.failed.append(rockspec_name)
+                else:
+                    fetched.append(rockspec_name)
+
+            with stats.phase("index"):
+                specs = parse_many([contents[rockspec_name] for rockspec_name in fetched])
+            for rockspec_name, spec in zip(fetched, specs):
+                if rockspec_name in self.rockspecs:
+                    result.refreshed += 1
+                else:
+                    result.added += 1
+                if isinstance(spec, MainError):
+                    self.rockspecs[rockspec_name] = None
+                    result.broken.append(rockspec_name)
+                else:
+                    self.rockspecs[rockspec_name] = (*wanted[rockspec_name], spec.deps_rules)
+            self.save()
+
+        if not result.failed:
+            self.digest = digest
+        self.save()
+        return result
+
+    def dependents(self, package_name: str) -> list[Dependent]:
+        if self._dependents is None:
+            dependents: dict[str, list[Dependent]] = {}
+            for entry in self.rockspecs.values():
+                if entry is None:
+                    continue
+                package, version, rules = entry
+                for rule in rules:
+                    dependents.setdefault(rule.name, []).append(Dependent(package, version, rule))
+
+            for found in dependents.values():
+                found.sort(key=lambda dependent: (dependent.package, version_key(dependent.version)))
+            self._dependents = dependents
+
+        return self._dependents.get(package_name, [])
+
+    def matching(self, rule: DepRule) -> list[str]:
+        if rule.error is not None:
+            return []
+        version_range = VersionRange.from_rules(rule.constraints)
+        versions = self.versions.get(rule.name, [])
+        return sorted((version for version in versions if version_key(version) in version_range), key=version_key)
+
+    def tree(self, package_name: str, version: Optional[str] = None, transitive: bool = False) -> list[RdepNode]:
+        expanded = {package_name}
+
+        def build(name: str) -> list[RdepNode]:
+            nodes = [RdepNode(dependent, self.matching(dependent.rule)) for dependent in self.dependents(name)]
+            if transitive:
+                for node in nodes:
+                    if node.dependent.package not in expanded:
+                        expanded.add(node.dependent.package)
+                        node.children = build(node.dependent.package)
+            return nodes
+
+        roots = build(package_name)
+        if version is not None:
+            selected = set(self.matching(DepRule(package_name, "==", version)))
+            roots = [node for node in roots if selected.intersection(node.versions)]
+        return roots
+
+
+def render(nodes: list[RdepNode], level: int = 1) -> Iterator[str]:
+    padding = '\t' * level
+    for node in nodes:
+        dependent = node.dependent
+        if node.versions:
+            versions = ", ".join(node.versions)
+        elif dependent.rule.error is not None:
+            versions = f"x, invalid rule: {dependent.rule.error}"
+        else:
+            versions = "x, no version in manifest"
+        yield f"{padding} {dependent.package} {dependent.version}: {dependent.rule} [{versions}]"
+        yield from render(node.children, level + 1)
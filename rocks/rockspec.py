@@ -1,31 +1,68 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from rocks.lua import interpretator, lua_type, table2dict
+from typing import Optional, Sequence, Union
+
+from rocks.errors import DepRuleError, LuaValueError, MainError, RockspecError
+from rocks.lua import get_sandbox, lua_type
+
+
+_DEP_RULE = re.compile(r"^\s*([^\s<>=~!,]+)\s*(.*?)\s*$", re.S)
+_CONSTRAINT = re.compile(r"^\s*(==|~=|!=|>=|<=|~>|=|>|<)?\s*([^\s<>=~!,]+)\s*$")
+_OPERATOR_ALIASES = {"!=": "~="}
+
+
+def parse_constraints(constraints: str) -> list[tuple[str, str]]:
+    rules = []
+    for constraint in constraints.split(","):
+        if not constraint.strip():
+            continue
+        match = _CONSTRAINT.match(constraint)
+        if match is None:
+            raise DepRuleError(f"invalid version constraint: {constraint.strip()}")
+        operator = match.group(1) or "=="
+        rules.append((_OPERATOR_ALIASES.get(operator, operator), match.group(2)))
+
+    return rules
 
 
 class DepRule:
-    def __init__(self, name: str, op: str = ">=", version: str = "0.1.0", *args):
+    def __init__(self, name: str, op: str = "", version: str = "", *args):
         self.name = name
-        self.op = op
+        self.op = _OPERATOR_ALIASES.get(op, op)
         self.version = version.strip(",")
         self.additional = args
+        self.constraints = ([(self.op, self.version)] if self.version else []) + parse_constraints(",".join(args))
+        self.error: Optional[str] = None
 
     def __str__(self) -> str:
-        return ','.join((f"{self.name} {self.op} {self.version}", ' '.join(self.additional)))
+        if self.error is not None:
+            return self.version
+        if not self.constraints:
+            return self.name
+        return f"{self.name} " + ", ".join(f"{op} {version}" for op, version in self.constraints)
 
     @classmethod
-    def from_str(cls, dep_rule: str) -> 'DepRule':
-        parts = dep_rule.split(" ")
-
-        if len(parts) == 1:
-            return cls(parts[0])
+    def invalid(cls, dep_rule: str, error: str) -> 'DepRule':
+        match = _DEP_RULE.match(dep_rule)
+        rule = cls(dep_rule.strip() if match is None else match.group(1))
+        rule.op, rule.version, rule.constraints, rule.error = "", dep_rule.strip(), [], error
+        return rule
 
-        if len(parts) == 2:
-            return cls(parts[0], "==", parts[1])
+    @classmethod
+    def from_str(cls, dep_rule: str) -> 'DepRule':
+        match = _DEP_RULE.match(dep_rule)
+        if match is None:
+            raise DepRuleError(f"invalid dependency: {dep_rule}")
 
-        if parts[1] not in ('=', '==', '>', '>=', '<', '<=', '~>'):
-            return cls(parts[0], "==", parts[1], *parts[1:])
+        name, constraints = match.groups()
+        rules = parse_constraints(constraints)
+        if not rules:
+            return cls(name)
 
-        return cls(*parts)
+        (op, version), *additional = rules
+        return cls(name, op, version, *(f"{op} {version}" for op, version in additional))
 
 
 @dataclass
@@ -38,29 +75,77 @@ class Rockspec:
 
     @classmethod
     def open(cls, path: str) -> 'Rockspec':
-        with open(path) as specfile:
-            content = specfile.read()
-            return cls.from_string(content)
+        with open(path, "rb") as specfile:
+            return cls.from_string(specfile.read())
 
     @classmethod
-    def from_string(cls, content: str) -> 'Rockspec':
-        specdata = interpretator.execute(
-            "do " + content + " ;return {package = package, version = version, source = source, deps = dependencies, build = build} end"
-        )
+    def from_string(cls, content: Union[str, bytes]) -> 'Rockspec':
+        if isinstance(content, bytes):
+            try:
+                content = content.decode("utf-8")
+            except UnicodeDecodeError as e:
+                raise RockspecError(f"rockspec is not valid utf-8: {e}") from None
+
+        try:
+            specdata = get_sandbox().evaluate(
+                content,
+                ("package", "version", "source", "dependencies", "build"),
+                chunk_name="=rockspec",
+            )
+        except LuaValueError as e:
+            raise RockspecError(str(e)) from None
+        for name in ("package", "version"):
+            if not isinstance(specdata[name], str):
+                raise RockspecError(f"`{name}` must be a string, got {_lua_type_name(specdata[name])}")
+        for name in ("source", "dependencies", "build"):
+            if specdata[name] is not None and not isinstance(specdata[name], dict):
+                raise RockspecError(f"`{name}` must be a table, got {_lua_type_name(specdata[name])}")
 
         dep_rules = []
-        if specdata.deps is not None:
-            for rule in dict(specdata.deps).values():
-                dep_rules.append(DepRule.from_str(rule))
+        if specdata["dependencies"] is not None:
+            for rule in specdata["dependencies"].values():
+                if not isinstance(rule, str):
+                    raise RockspecError(f"dependency must be a string, got {_lua_type_name(rule)}")
+                try:
+                    dep_rules.append(DepRule.from_str(rule))
+                except DepRuleError as e:
+                    dep_rules.append(DepRule.invalid(rule, str(e)))
 
         return Rockspec(
-            package=specdata.package,
-            version=specdata.version,
-            source=table2dict(specdata.source),
+            package=specdata["package"],
+            version=specdata["version"],
+            source=specdata["source"] or {},
             deps_rules=dep_rules,
-            build=table2dict(specdata.build)
+            build=specdata["build"] or {},
         )
 
 
+_PYTHON_TYPES = ((bool, "boolean"), ((int, float), "number"), (str, "string"), (dict, "table"))
+
+
+def _lua_type_name(value) -> str:
+    if value is None:
+        return "nil"
+    for types, name in _PYTHON_TYPES:
+        if isinstance(value, types):
+            return name
+    return lua_type(value) or type(value).__name__
+
+
+def _parse(content: Union[str, bytes]) -> Union[Rockspec, MainError]:
+    try:
+        return Rockspec.from_string(content)
+    except MainError as e:
+        return e
+
 
+def parse_many(
+        contents: Sequence[Union[str, bytes]],
+        workers: Optional[int] = None,
+) -> list[Union[Rockspec, MainError]]:
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(contents) < 2 * workers:
+        return [_parse(content) for content in contents]
 
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_parse, contents, chunksize=max(1, len(contents) // (workers * 4))))
@@ -0,0 +1,84 @@
+import fnmatch
+import heapq
+import re
+from bisect import bisect_left
+from collections import Counter
+from typing import Iterable, Sequence
+
+_WILDCARDS = re.compile(r"[*?\[]")
+_LITERALS = re.compile(r"\[[^\]]*\]|[*?]")
+_PREFIX_END = "\U0010ffff"
+
+
+def trigrams(text: str) -> set[str]:
+    padded = f"  {text.lower()} "
+    return {padded[position:position + 3] for position in range(len(padded) - 2)}
+
+
+def _inner_trigrams(fragment: str) -> set[str]:
+    fragment = fragment.lower()
+    return {fragment[position:position + 3] for position in range(len(fragment) - 2)}
+
+
+def is_pattern(query: str) -> bool:
+    return _WILDCARDS.search(query) is not None
+
+
+class SearchIndex:
+
+    def __init__(self, names: Sequence[str], postings: dict[str, list[int]], sizes: list[int]):
+        self.names = names
+        self.postings = postings
+        self.sizes = sizes
+
+    @classmethod
+    def from_names(cls, names: Iterable[str]) -> 'SearchIndex':
+        names = list(names)
+        postings: dict[str, list[int]] = {}
+        sizes = []
+        for position, name in enumerate(names):
+            grams = trigrams(name)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+        return cls(names, postings, sizes)
+
+    def prefix(self, prefix: str) -> range:
+        return range(bisect_left(self.names, prefix), bisect_left(self.names, prefix + _PREFIX_END))
+
+    def _rarest(self, fragments: list[str]) -> Sequence[int]:
+        grams = set().union(*map(_inner_trigrams, fragments))
+        return min((self.postings.get(gram, []) for gram in grams), key=len)
+
+    def glob(self, pattern: str) -> list[int]:
+        if not is_pattern(pattern):
+            position = bisect_left(self.names, pattern)
+            return [position] if position < len(self.names) and self.names[position] == pattern else []
+
+        literal = _WILDCARDS.split(pattern, 1)[0]
+        candidates = self.prefix(literal)
+        if pattern == literal + "*":
+            return list(candidates)
+
+        fragments = [fragment for fragment in _LITERALS.split(pattern) if len(fragment) >= 3]
+        if fragments:
+            candidates = [position for position in self._rarest(fragments) if position in candidates]
+
+        match = re.compile(fnmatch.translate(pattern)).match
+        return [position for position in candidates if match(self.names[position])]
+
+    def fuzzy(self, query: str, limit: int = 10, threshold: float = 0.3) -> list[tuple[int, float]]:
+        grams = trigrams(query)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+
+        needed = threshold * len(grams)
+        scored = []
+        for position, count in shared.items():
+            if count >= needed:
+                score = count / (len(grams) + self.sizes[position] - count)
+                if score >= threshold:
+                    scored.append((score, -position))
+
+        return [(-position, score) for score, position in heapq.nlargest(limit, scored)]
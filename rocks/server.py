@@ -1,38 +1,298 @@
+import hashlib
 import http
+import io
+import re
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from os import path
+from typing import Iterable, Iterator, Optional, Union
+from urllib.parse import unquote, urlsplit
 
-import requests
-
+from rocks import stats
+from rocks.backend import Backend, BytesLike, Progress, backend_for
+from rocks.cache import CacheEntry, HttpCache
 from rocks.errors import FileLoadError
+from rocks.lazy import lazy_import
 from rocks.manifest import Manifest
 from rocks.rockspec import Rockspec
+from rocks.snapshot import ManifestSnapshots
+
+_requests = lazy_import("requests")
+
+_HREF = re.compile(rb"""href\s*=\s*["']?([^"'\s>]+)""", re.I)
+_LISTING_NAMES = ("index.html", "")
 
 
 class RockServer:
 
-    def __init__(self, address: str):
+    def __init__(
+            self,
+            address: str,
+            pool_size: int = 10,
+            keep_alive: bool = True,
+            timeout: Union[float, tuple[float, float], None] = (5.0, 30.0),
+            gzip: bool = True,
+            retries: int = 2,
+            cache: Optional[HttpCache] = None,
+            offline: bool = False,
+            snapshots: Optional[ManifestSnapshots] = None,
+            lua_version: Optional[str] = None,
+            use_listing: bool = True,
+            backend: Optional[Backend] = None,
+    ):
+        if backend is None:
+            backend = backend_for(
+                address,
+                pool_size=pool_size,
+                keep_alive=keep_alive,
+                timeout=timeout,
+                gzip=gzip,
+                retries=retries,
+            )
+        self.backend = backend
         self.address = address
+        self.pool_size = pool_size
+        self.cache = cache if backend.cacheable else None
+        self.offline = offline and backend.cacheable
+        self.snapshots = snapshots
+        self.lua_version = lua_version
+        self.use_listing = use_listing
+        self._listing: Optional[frozenset[str]] = None
+        self._listing_loaded = False
+        self._listing_lock = threading.Lock()
+
+    def close(self):
+        self.backend.close()
+
+    def __enter__(self) -> 'RockServer':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def manifest_names(self) -> list[str]:
+        if self.lua_version is None:
+            return ["manifest"]
+
+        name = f"manifest-{self.lua_version}"
+        return [f"{name}.json", f"{name}.zip", name, "manifest"]
+
+    def get_manifest(self, progress: Optional[Progress] = None) -> Manifest:
+        for name in self.manifest_names():
+            try:
+                with self.open_file(name, progress) as content:
+                    return self.load_manifest(name, content)
+            except FileLoadError as e:
+                if e.status_code != http.HTTPStatus.NOT_FOUND:
+                    raise
+                continue
+
+        raise FileLoadError(f"Unable to find any manifest on {self.address}", http.HTTPStatus.NOT_FOUND)
+
+    def get_manifest_file(self) -> tuple[str, bytes]:
+        for name in self.manifest_names():
+            try:
+                return name, self.get_raw_file(name)
+            except FileLoadError as e:
+                if e.status_code != http.HTTPStatus.NOT_FOUND:
+                    raise
+
+        raise FileLoadError(f"Unable to find any manifest on {self.address}", http.HTTPStatus.NOT_FOUND)
 
-    def get_manifest(self) -> Manifest:
-        return Manifest.from_lua_str(self.get_raw_file("manifest").decode("utf-8"))
+    def load_manifest(self, name: str, content: BytesLike) -> Manifest:
+        digest = None
+        if self.snapshots is not None:
+            digest = hashlib.sha256(content).hexdigest()
+            manifest = self.snapshots.load(digest)
+            stats.cache("snapshot", "miss" if manifest is None else "hit")
+            if manifest is not None:
+                return manifest
+
+        if name.endswith(".zip"):
+            with stats.phase("decode"), zipfile.ZipFile(io.BytesIO(content)) as archive:
+                member = name[:-len(".zip")]
+                if member not in archive.namelist():
+                    member = archive.namelist()[0]
+                with archive.open(member) as manifest_file:
+                    content = manifest_file.read()
+
+        if name.endswith(".json"):
+            manifest = Manifest.from_json(bytes(content))
+        else:
+            manifest = Manifest.from_lua_str(content)
+
+        if digest is not None:
+            self.snapshots.save(digest, manifest)
+
+        return manifest
 
     def get_raw_file(self, name: str) -> bytes:
-        response = requests.get(path.join(self.address, name))
+        if self.cache is None:
+            if self.offline:
+                raise FileLoadError(
+                    f"Unable to get file in offline mode without cache: {path.join(self.address, name)}")
+            return self.backend.fetch(name).content
 
-        if response.status_code < http.HTTPStatus.OK or response.status_code >= http.HTTPStatus.MULTIPLE_CHOICES:
-            raise FileLoadError(
-                f"Unable to get file: [{response.status_code}] {response.url}"
-            )
+        with self.cache.pinned(path.join(self.address, name)):
+            content = self.cache.read(self._cached(name))
+        if content is None:
+            return self.backend.fetch(name).content
+        return content
+
+    @contextmanager
+    def open_file(self, name: str, progress: Optional[Progress] = None) -> Iterator[BytesLike]:
+        if self.cache is None:
+            if self.offline:
+                raise FileLoadError(
+                    f"Unable to get file in offline mode without cache: {path.join(self.address, name)}")
+            with self.backend.mapped(name, progress) as content:
+                yield content
+            return
+
+        with self.cache.pinned(path.join(self.address, name)), \
+                self.cache.mapped(self._cached(name, progress)) as content:
+            yield content
+
+    def _cached(self, name: str, progress: Optional[Progress] = None) -> CacheEntry:
+        url = path.join(self.address, name)
+        entry = self.cache.get(url)
+        if entry is not None and (self.offline or self.cache.is_fresh(entry)):
+            stats.cache("http", "hit")
+            if entry.missing:
+                raise FileLoadError(f"Unable to get file: [cached {http.HTTPStatus.NOT_FOUND}] {url}",
+                                    http.HTTPStatus.NOT_FOUND)
+            return entry
+
+        if self.offline:
+            raise FileLoadError(f"Unable to get file in offline mode, not cached: {url}")
+
+        if entry is not None and entry.missing:
+            entry = None
+
+        with self.cache.receive(url) as file:
+            try:
+                validators = entry.validators() if entry is not None else None
+                response = self.backend.download(name, file, validators, progress)
+            except FileLoadError as e:
+                if e.status_code == http.HTTPStatus.NOT_FOUND:
+                    self.cache.store_missing(url)
+                raise
 
-        return response.content
+            if entry is not None and response.status_code == http.HTTPStatus.NOT_MODIFIED:
+                if path.exists(entry.path):
+                    stats.cache("http", "revalidated")
+                    self.cache.revalidated(entry)
+                    return entry
+                response = self.backend.download(name, file, progress=progress)
+
+            stats.cache("http", "miss")
+            return self.cache.store_file(url, file, response.headers)
+
+    @staticmethod
+    def parse_listing(content: bytes) -> Optional[frozenset[str]]:
+        names = set()
+        for href in _HREF.findall(content):
+            link = urlsplit(unquote(href.decode("utf-8", "replace")))
+            if link.query or link.netloc or not link.path or link.path.endswith("/"):
+                continue
+            names.add(path.basename(link.path))
+
+        if "manifest" not in names and not any(name.endswith((".rockspec", ".rock")) for name in names):
+            return None
+
+        return frozenset(names)
+
+    def listing(self) -> Optional[frozenset[str]]:
+        if not self.use_listing:
+            return None
+
+        listing = self.backend.listing()
+        if listing is not None:
+            return listing
+
+        if self._listing_loaded:
+            return self._listing
+
+        with self._listing_lock:
+            if self._listing_loaded:
+                return self._listing
+
+            for name in _LISTING_NAMES:
+                try:
+                    content = self.get_raw_file(name)
+                except (FileLoadError, _requests().RequestException):
+                    continue
+
+                self._listing = self.parse_listing(content)
+                if self._listing is not None:
+                    break
+
+            self._listing_loaded = True
+
+        return self._listing
+
+    def refresh(self):
+        self.backend.refresh()
+        with self._listing_lock:
+            self._listing = None
+            self._listing_loaded = False
 
     def raw_file_exists(self, name: str) -> bool:
-        response = requests.head(path.join(self.address, name))
-        return response.status_code == http.HTTPStatus.OK
+        listing = self.listing()
+        if listing is not None:
+            stats.cache("listing", "hit")
+            return name in listing
 
-    def file_exists(self, package_name: str, version: str, arch: str) -> bool:
+        url = path.join(self.address, name)
+        if self.cache is not None:
+            entry = self.cache.get(url)
+            if entry is not None and (self.offline or self.cache.is_fresh(entry)):
+                stats.cache("http", "hit")
+                return not entry.missing
+
+        if self.offline:
+            return False
+
+        return self.backend.exists(name)
+
+    def get_many(self, names: Iterable[str]) -> dict[str, Union[bytes, FileLoadError, None]]:
+        def load(name: str) -> Union[bytes, FileLoadError, None]:
+            try:
+                return self.get_raw_file(name)
+            except FileLoadError as e:
+                return None if e.status_code == http.HTTPStatus.NOT_FOUND else e
+            except _requests().RequestException as e:
+                return FileLoadError(f"Unable to get file: {e}")
+
+        names = list(dict.fromkeys(names))
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            return dict(zip(names, executor.map(load, names)))
+
+    def exists_many(self, names: Iterable[str]) -> dict[str, Union[bool, FileLoadError]]:
+        def check(name: str) -> Union[bool, FileLoadError]:
+            try:
+                return self.raw_file_exists(name)
+            except _requests().RequestException as e:
+                return FileLoadError(f"Unable to check file: {e}")
+
+        names = list(dict.fromkeys(names))
+        listing = self.listing()
+        if listing is not None:
+            stats.cache("listing", "hit", len(names))
+            return {name: name in listing for name in names}
+
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            return dict(zip(names, executor.map(check, names)))
+
+    @staticmethod
+    def arch_file_name(package_name: str, version: str, arch: str) -> str:
         if arch == "all" or arch == "src":
             extension = f"{arch}.rock"
         else:
             extension = arch
-        return self.raw_file_exists(f"{package_name}-{version}.{extension}")
+        return f"{package_name}-{version}.{extension}"
+
+    def file_exists(self, package_name: str, version: str, arch: str) -> bool:
+        return self.raw_file_exists(self.arch_file_name(package_name, version, arch))
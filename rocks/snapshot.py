@@ -0,0 +1,71 @@
+import os
+import pickle
+import tempfile
+from typing import Optional
+
+from rocks.manifest import Manifest
+
+MAGIC = b"ROCKSNAP"
+FORMAT_VERSION = 6
+
+
+class ManifestSnapshots:
+
+    def __init__(self, directory: str, keep: int = 8):
+        self.directory = directory
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{digest}.snapshot")
+
+    def load(self, digest: str) -> Optional[Manifest]:
+        snapshot_path = self._path(digest)
+        try:
+            with open(snapshot_path, "rb") as snapshot:
+                header = snapshot.read(len(MAGIC) + 2)
+                if header != MAGIC + FORMAT_VERSION.to_bytes(2, "big"):
+                    raise ValueError("unsupported snapshot format")
+                manifest = pickle.load(snapshot)
+        except FileNotFoundError:
+            return None
+        except (ValueError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError):
+            self._remove(snapshot_path)
+            return None
+
+        if not isinstance(manifest, Manifest):
+            self._remove(snapshot_path)
+            return None
+
+        os.utime(snapshot_path)
+        return manifest
+
+    def save(self, digest: str, manifest: Manifest):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(MAGIC + FORMAT_VERSION.to_bytes(2, "big"))
+                pickle.dump(manifest, tmp, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(digest))
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+
+        self._prune()
+
+    def _prune(self):
+        snapshots = [
+            (item.stat().st_mtime, item.path)
+            for item in os.scandir(self.directory)
+            if item.name.endswith(".snapshot")
+        ]
+        snapshots.sort(reverse=True)
+        for _, snapshot_path in snapshots[self.keep:]:
+            self._remove(snapshot_path)
+
+    @staticmethod
+    def _remove(file_path: str):
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,262 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Iterable, Optional, Union
+
+from rocks import stats
+from rocks.errors import FileLoadError, MainError
+from rocks.manifest import Manifest, SemanticVersion, Version, VersionRange
+from rocks.rockspec import DepRule, Rockspec
+from rocks.server import RockServer
+
+ROOT = "<root>"
+
+NOT_FOUND = "not found in manifest"
+NO_VERSION = "no version satisfies all requirements"
+NO_ROCKSPEC_FILE = "has rockspec in manifest, but file not found"
+INVALID_RULE = "invalid rule"
+INVALID_ROCKSPEC = "invalid rockspec"
+
+AnyVersion = Union[Version, SemanticVersion]
+Requirements = dict[str, tuple['Requirement', ...]]
+
+
+@dataclass(frozen=True)
+class Requirement:
+    requirer: str
+    rule: DepRule
+
+    def __str__(self) -> str:
+        return f"{self.requirer} requires {self.rule}"
+
+
+@dataclass
+class Conflict:
+    package: str
+    reason: str
+    requirements: tuple[Requirement, ...]
+    assigned: Optional[AnyVersion] = None
+
+    def explain(self) -> list[str]:
+        lines = [f"{self.package}: {self.reason}"]
+        if self.assigned is not None:
+            lines.append(f"\t{self.package} {self.assigned.name} is already chosen")
+        lines.extend(f"\t{requirement}" for requirement in self.requirements)
+        return lines
+
+
+@dataclass
+class Resolution:
+    versions: dict[str, AnyVersion] = field(default_factory=dict)
+    conflict: Optional[Conflict] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.conflict is None
+
+
+class Solver:
+
+    def __init__(self, server: RockServer, man: Manifest, excluded: list[str], max_steps: int = 100000):
+        self.server = server
+        self.manifest = man
+        self.excluded = excluded
+        self.max_steps = max_steps
+        self.specs: dict[str, Optional[Rockspec]] = {}
+        self.invalid: dict[str, str] = {}
+        self.ranges: dict[tuple[Requirement, ...], VersionRange] = {}
+        self.candidates: dict[tuple[str, VersionRange], list[AnyVersion]] = {}
+
+    def solve(self, roots: Iterable[Requirement]) -> Resolution:
+        with stats.phase("resolve"):
+            return self._solve(roots)
+
+    def _solve(self, roots: Iterable[Requirement]) -> Resolution:
+        requirements: Requirements = {}
+        for requirement in roots:
+            if requirement.rule.error is not None:
+                return Resolution(conflict=Conflict(
+                    requirement.rule.name, f"{INVALID_RULE}: {requirement.rule.error}", (requirement,)))
+            if requirement.rule.name not in self.excluded:
+                requirements[requirement.rule.name] = requirements.get(requirement.rule.name, ()) + (requirement,)
+
+        for name, required in requirements.items():
+            if not self._candidates(name, required):
+                return Resolution(conflict=self._conflict(name, required))
+
+        failed: set[frozenset] = set()
+        conflicts: Counter = Counter()
+        latest: dict[str, Conflict] = {}
+        assigned: dict[str, AnyVersion] = {}
+        stack = []
+        steps = 0
+        while True:
+            name = self._next(assigned, requirements)
+            if name is None:
+                return Resolution(assigned)
+
+            stack.append((assigned, requirements, name, iter(self._candidates(name, requirements[name]))))
+            while stack:
+                assigned, requirements, name, options = stack[-1]
+                version = next(options, None)
+                if version is None:
+                    failed.add(frozenset((package, chosen.name) for package, chosen in assigned.items()))
+                    stack.pop()
+                    continue
+
+                steps += 1
+                if steps > self.max_steps:
+                    return Resolution(assigned, Conflict(name, f"gave up after {self.max_steps} steps", ()))
+
+                state = self._assign(assigned, requirements, name, version)
+                if isinstance(state, Conflict):
+                    conflicts[state.package] += 1
+                    latest[state.package] = state
+                    continue
+
+                if frozenset((package, chosen.name) for package, chosen in state[0].items()) in failed:
+                    continue
+
+                assigned, requirements = state
+                break
+            else:
+                if not conflicts:
+                    return Resolution(conflict=Conflict(name, NO_VERSION, requirements[name]))
+                package, _ = conflicts.most_common(1)[0]
+                return Resolution(conflict=latest[package])
+
+    def solve_each(self, roots: Iterable[Iterable[Requirement]]) -> list[Resolution]:
+        return [self.solve(requirements) for requirements in roots]
+
+    def _range(self, requirements: tuple[Requirement, ...]) -> VersionRange:
+        version_range = self.ranges.get(requirements)
+        if version_range is None:
+            version_range = VersionRange.from_rules(
+                constraint for requirement in requirements for constraint in requirement.rule.constraints
+            )
+            self.ranges[requirements] = version_range
+        return version_range
+
+    def _candidates(self, name: str, requirements: tuple[Requirement, ...]) -> list[AnyVersion]:
+        version_range = self._range(requirements)
+        candidates = self.candidates.get((name, version_range))
+        if candidates is None:
+            package = self.manifest.search(name)
+            candidates = [] if package is None else package.candidates_in(version_range)
+            self.candidates[(name, version_range)] = candidates
+        return candidates
+
+    def _next(self, assigned: dict[str, AnyVersion], requirements: Requirements) -> Optional[str]:
+        pending = [name for name in requirements if name not in assigned]
+        if not pending:
+            return None
+        return min(pending, key=lambda name: (len(self._candidates(name, requirements[name])), name))
+
+    def _assign(
+            self,
+            assigned: dict[str, AnyVersion],
+            requirements: Requirements,
+            name: str,
+            version: AnyVersion,
+    ) -> Union[tuple[dict[str, AnyVersion], Requirements], Conflict]:
+        spec = self._spec(name, version)
+        if spec is None:
+            error = self.invalid.get(self._rockspec_name(name, version))
+            if error is not None:
+                return Conflict(name, f"{version.name} {INVALID_ROCKSPEC}: {error}", requirements[name])
+            return Conflict(name, f"{version.name} {NO_ROCKSPEC_FILE}", requirements[name])
+
+        assigned = {**assigned, name: version}
+        requirements = dict(requirements)
+        requirer = f"{name} {version.name}"
+        added = []
+        for rule in spec.deps_rules:
+            if rule.error is not None:
+                return Conflict(rule.name, f"{INVALID_RULE}: {rule.error}", (Requirement(requirer, rule),))
+            if rule.name in self.excluded or rule.name == name:
+                continue
+
+            required = requirements[rule.name] = requirements.get(rule.name, ()) + (Requirement(requirer, rule),)
+            chosen = assigned.get(rule.name)
+            if chosen is not None:
+                if chosen.key not in self._range(required):
+                    return self._conflict(rule.name, required, chosen)
+            elif not self._candidates(rule.name, required):
+                return self._conflict(rule.name, required)
+            else:
+                added.append(rule.name)
+
+        self._prefetch([(dep, self._candidates(dep, requirements[dep])[0]) for dep in added])
+        return assigned, requirements
+
+    def _conflict(
+            self,
+            name: str,
+            requirements: tuple[Requirement, ...],
+            assigned: Optional[AnyVersion] = None,
+    ) -> Conflict:
+        if self.manifest.search(name) is None:
+            return Conflict(name, NOT_FOUND, requirements)
+
+        if assigned is not None and not self._candidates(name, requirements):
+            assigned = None
+
+        def satisfiable(subset: tuple[Requirement, ...]) -> bool:
+            if assigned is not None:
+                return assigned.key in self._range(subset)
+            return bool(self._candidates(name, subset))
+
+        minimal = requirements
+        for requirement in requirements:
+            reduced = tuple(item for item in minimal if item is not requirement)
+            if not satisfiable(reduced):
+                minimal = reduced
+
+        return Conflict(name, NO_VERSION, minimal, assigned)
+
+    @staticmethod
+    def _rockspec_name(name: str, version: AnyVersion) -> str:
+        return f"{name}-{version.name}.rockspec"
+
+    def _prefetch(self, versions: list[tuple[str, AnyVersion]]):
+        names = [self._rockspec_name(name, version) for name, version in versions if version.has_arch("rockspec")]
+        names = [name for name in names if name not in self.specs]
+        if len(names) < 2:
+            return
+
+        for name, content in self.server.get_many(names).items():
+            if not isinstance(content, FileLoadError):
+                self._store(name, content)
+
+    def _store(self, rockspec_name: str, content: Optional[bytes]):
+        self.specs[rockspec_name] = None
+        if content is None:
+            return
+        try:
+            self.specs[rockspec_name] = Rockspec.from_string(content)
+        except MainError as e:
+            self.invalid[rockspec_name] = str(e)
+
+    def _spec(self, name: str, version: AnyVersion) -> Optional[Rockspec]:
+        rockspec_name = self._rockspec_name(name, version)
+        if rockspec_name not in self.specs:
+            if not version.has_arch("rockspec"):
+                self.specs[rockspec_name] = None
+            else:
+                try:
+                    content = self.server.get_raw_file(rockspec_name)
+                except FileLoadError:
+                    content = None
+                self._store(rockspec_name, content)
+        return self.specs[rockspec_name]
+
+
+def requirements_of(spec: Rockspec) -> list[Requirement]:
+    requirer = f"{spec.package} {spec.version}"
+    return [Requirement(requirer, rule) for rule in spec.deps_rules]
+
+
+def root_requirement(rule: str) -> Requirement:
+    name, _, version = rule.partition("@")
+    if version:
+        return Requirement(ROOT, DepRule(name, "==", version))
+    return Requirement(ROOT, DepRule.from_str(rule))
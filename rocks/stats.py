@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Iterator, Optional
+
+_NULL = nullcontext()
+_PERCENTILES = (50, 90, 99)
+
+
+def _percentile(values: list[float], percent: int) -> float:
+    position = (len(values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class Stats:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: dict[str, list[float]] = defaultdict(lambda: [0.0, 0])
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.sizes: Counter = Counter()
+        self.caches: dict[str, Counter] = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                entry = self.phases[name]
+                entry[0] += elapsed
+                entry[1] += 1
+
+    def request(self, method: str, seconds: float, size: int):
+        with self._lock:
+            self.latencies[method].append(seconds)
+            self.sizes[method] += size
+
+    def cache(self, name: str, outcome: str, count: int = 1):
+        with self._lock:
+            self.caches[name][outcome] += count
+
+    def report(self) -> dict:
+        with self._lock:
+            requests = {}
+            for method, latencies in sorted(self.latencies.items()):
+                latencies = sorted(latencies)
+                requests[method] = {
+                    "count": len(latencies),
+                    "bytes": self.sizes[method],
+                    "seconds": sum(latencies),
+                    **{f"p{percent}": _percentile(latencies, percent) for percent in _PERCENTILES},
+                    "max": latencies[-1],
+                }
+
+            caches = {}
+            for name, outcomes in sorted(self.caches.items()):
+                total = sum(outcomes.values())
+                caches[name] = {**outcomes, "hit_rate": outcomes["hit"] / total if total else 0.0}
+
+            return {
+                "wall": time.perf_counter() - self.started,
+                "phases": {
+                    name: {"seconds": seconds, "calls": calls} for name, (seconds, calls) in self.phases.items()
+                },
+                "requests": requests,
+                "caches": caches,
+            }
+
+    def render(self) -> Iterator[str]:
+        report = self.report()
+        yield f"wall: {report['wall']:.3f}s"
+        for name, phase in sorted(report["phases"].items(), key=lambda item: -item[1]["seconds"]):
+            yield f"phase {name}: {phase['seconds']:.3f}s in {phase['calls']} calls"
+        for method, request in report["requests"].items():
+            percentiles = " ".join(f"p{percent} {request[f'p{percent}'] * 1e3:.1f}ms" for percent in _PERCENTILES)
+            yield (f"http {method}: {request['count']} requests, {request['bytes']} bytes, "
+                   f"{percentiles} max {request['max'] * 1e3:.1f}ms")
+        for name, cache in report["caches"].items():
+            outcomes = ", ".join(f"{outcome} {count}" for outcome, count in cache.items() if outcome != "hit_rate")
+            yield f"cache {name}: {outcomes}, hit rate {cache['hit_rate']:.0%}"
+
+
+_current: Optional[Stats] = None
+
+
+def enable() -> Stats:
+    global _current
+    if _current is None:
+        _current = Stats()
+    return _current
+
+
+def phase(name: str) -> ContextManager:
+    return _NULL if _current is None else _current.phase(name)
+
+
+def request(method: str, seconds: float, size: int):
+    if _current is not None:
+        _current.request(method, seconds, size)
+
+
+def cache(name: str, outcome: str, count: int = 1):
+    if _current is not None:
+        _current.cache(name, outcome, count)
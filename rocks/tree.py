@@ -0,0 +1,172 @@
+from dataclasses import dataclass, field
+from typing import Generator, Iterator, Optional, Union
+
+from rocks import stats
+from rocks.errors import FileLoadError, MainError
+from rocks.manifest import Manifest, Package, SemanticVersion, Version
+from rocks.rockspec import DepRule, Rockspec
+from rocks.server import RockServer
+
+EXCLUDED = "excluded"
+CYCLIC = "cyclicdep"
+NOT_FOUND = "not found in manifest"
+VERSION_NOT_FOUND = "version not found"
+NO_ROCKSPEC_FILE = "has rockspec in manifest, but file not found"
+INVALID_RULE = "invalid rule"
+INVALID_ROCKSPEC = "invalid rockspec"
+ERROR = "error"
+RESOLVED = "resolved"
+
+
+@dataclass
+class DepNode:
+    rule: DepRule
+    status: str
+    package: Optional[Package] = None
+    version: Optional[Union[Version, SemanticVersion]] = None
+    has_arch: bool = False
+    has_arch_file: bool = False
+    children: list['DepNode'] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def rockspec_name(self) -> str:
+        return f"{self.rule.name}-{self.version.name}.rockspec"
+
+
+class DepTree:
+
+    def __init__(self, server: RockServer, man: Manifest, excluded: list[str], check_arch: str = "rockspec"):
+        self.server = server
+        self.manifest = man
+        self.excluded = excluded
+        self.check_arch = check_arch
+        self.specs: dict[str, Optional[Rockspec]] = {}
+        self.files: dict[str, bool] = {}
+        self.invalid: dict[str, str] = {}
+        self.errors: dict[str, str] = {}
+
+    def walk(self, spec: Rockspec) -> Generator[list[DepNode], None, list[DepNode]]:
+        roots = []
+        pending = [(roots, spec, frozenset((spec.package,)))]
+        while pending:
+            level = []
+            for children, parent, ancestors in pending:
+                for rule in parent.deps_rules:
+                    node = self._make_node(rule, ancestors)
+                    children.append(node)
+                    if node.status == RESOLVED:
+                        level.append((node, ancestors | {rule.name}))
+
+            yield [node for node, _ in level]
+
+            pending = []
+            for node, ancestors in level:
+                arch_file_name = self._arch_file_name(node)
+                error = self.errors.get(node.rockspec_name) or self.errors.get(arch_file_name)
+                if error is not None:
+                    node.status, node.error = ERROR, error
+                    continue
+                node.has_arch_file = self.files[arch_file_name]
+                cur_spec = self.specs[node.rockspec_name]
+                if cur_spec is None:
+                    node.error = self.invalid.get(node.rockspec_name)
+                    node.status = NO_ROCKSPEC_FILE if node.error is None else INVALID_ROCKSPEC
+                    continue
+                pending.append((node.children, cur_spec, ancestors))
+
+        return roots
+
+    def resolve(self, spec: Rockspec) -> list[DepNode]:
+        walk = self.walk(spec)
+        with stats.phase("resolve"):
+            try:
+                nodes = next(walk)
+                while True:
+                    self._fetch(nodes)
+                    nodes = walk.send(None)
+            except StopIteration as stop:
+                return stop.value
+
+    def _make_node(self, rule: DepRule, ancestors: frozenset) -> DepNode:
+        if rule.error is not None:
+            return DepNode(rule, INVALID_RULE, error=rule.error)
+
+        if rule.name in self.excluded:
+            return DepNode(rule, EXCLUDED)
+
+        if rule.name in ancestors:
+            return DepNode(rule, CYCLIC)
+
+        package = self.manifest.search(rule.name)
+        if package is None:
+            return DepNode(rule, NOT_FOUND)
+
+        version = package.get_version_by_rules(rule.constraints)
+        if version is None:
+            return DepNode(rule, VERSION_NOT_FOUND, package)
+
+        return DepNode(rule, RESOLVED, package, version, has_arch=version.has_arch(self.check_arch))
+
+    def _arch_file_name(self, node: DepNode) -> str:
+        return RockServer.arch_file_name(node.package.name, node.version.name, self.check_arch)
+
+    def missing(self, nodes: list[DepNode]) -> tuple[list[str], list[str]]:
+        arch_files = [name for name in map(self._arch_file_name, nodes) if name not in self.files]
+        rockspecs = [node.rockspec_name for node in nodes if node.rockspec_name not in self.specs]
+        return list(dict.fromkeys(arch_files)), list(dict.fromkeys(rockspecs))
+
+    def store(
+            self,
+            files: dict[str, Union[bool, FileLoadError]],
+            rockspecs: dict[str, Union[bytes, FileLoadError, None]],
+    ):
+        for name, exists in files.items():
+            if isinstance(exists, FileLoadError):
+                self.errors[name] = str(exists)
+                continue
+            self.errors.pop(name, None)
+            self.files[name] = exists
+        for name, content in rockspecs.items():
+            if isinstance(content, FileLoadError):
+                self.errors[name] = str(content)
+                continue
+            self.errors.pop(name, None)
+            self.specs[name] = None
+            if content is None:
+                continue
+            try:
+                self.specs[name] = Rockspec.from_string(content)
+            except MainError as e:
+                self.invalid[name] = str(e)
+
+    def _fetch(self, nodes: list[DepNode]):
+        arch_files, rockspecs = self.missing(nodes)
+        self.store(
+            self.server.exists_many(arch_files) if arch_files else {},
+            self.server.get_many(rockspecs) if rockspecs else {},
+        )
+
+
+def render(nodes: list[DepNode], check_arch: str, level: int = 1) -> Iterator[str]:
+    mark = u'✓'
+    unmark = 'x'
+    padding = '\t' * level
+
+    for node in nodes:
+        rule = node.rule
+        if node.status in (EXCLUDED, CYCLIC):
+            yield f"{padding} {rule} [{mark}, {node.status}]"
+        elif node.status in (NOT_FOUND, VERSION_NOT_FOUND):
+            yield f"{padding} {rule} [{unmark}, {node.status}]"
+        elif node.status == INVALID_RULE:
+            yield f"{padding} {rule} [{unmark}, {node.status}: {node.error}]"
+        elif node.status == NO_ROCKSPEC_FILE:
+            yield f"{padding} {rule} [{node.version} {unmark}, {node.status}]"
+        elif node.status in (INVALID_ROCKSPEC, ERROR):
+            yield f"{padding} {rule} [{node.version} {unmark}, {node.status}: {node.error}]"
+        else:
+            has_arch = mark if node.has_arch else unmark
+            has_arch_file = mark if node.has_arch_file else unmark
+            yield f"{padding} {rule} [{node.version} {check_arch}: manifest({has_arch})/file({has_arch_file}) ]"
+            yield from render(node.children, check_arch, level + 1)
@@ -0,0 +1,82 @@
+import heapq
+import re
+from operator import attrgetter
+from typing import Any
+
+_INDENT = "   "
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_KEYWORDS = frozenset((
+    "and", "break", "do", "else", "elseif", "end", "false", "for", "function", "goto", "if", "in",
+    "local", "nil", "not", "or", "repeat", "return", "then", "true", "until", "while",
+))
+_ESCAPES = {"\\": "\\\\", '"': '\\"', "\n": "\\n", "\r": "\\r", "\0": "\\000"}
+_ESCAPE = re.compile(r'[\\"\n\r\0]')
+
+
+def lua_string(value: str) -> str:
+    return '"' + _ESCAPE.sub(lambda match: _ESCAPES[match.group()], value) + '"'
+
+
+def lua_key(key: Any) -> str:
+    if isinstance(key, str):
+        if _IDENTIFIER.match(key) and key not in _KEYWORDS:
+            return key
+        return f"[{lua_string(key)}]"
+    return f"[{render_value(key)}]"
+
+
+def _sort_key(key: Any) -> tuple:
+    return (0, key, "") if isinstance(key, (int, float)) and not isinstance(key, bool) else (1, 0, str(key))
+
+
+def _block(entries: list[str], level: int) -> str:
+    if not entries:
+        return "{}"
+
+    padding = _INDENT * (level + 1)
+    return "{\n" + ",\n".join(padding + entry for entry in entries) + "\n" + _INDENT * level + "}"
+
+
+def render_value(value: Any, level: int = 0) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None:
+        return "nil"
+    if isinstance(value, str):
+        return lua_string(value)
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return _block([render_value(item, level + 1) for item in value], level)
+    if isinstance(value, dict):
+        if list(value) == list(range(1, len(value) + 1)):
+            return _block([render_value(item, level + 1) for item in value.values()], level)
+        return _block([
+            f"{lua_key(key)} = {render_value(value[key], level + 1)}"
+            for key in sorted(value, key=_sort_key)
+        ], level)
+
+    raise TypeError(f"unable to render {type(value).__name__} as lua value")
+
+
+def render_package(package) -> str:
+    if package.rendered is not None:
+        return package.rendered
+
+    versions = heapq.merge(package.semver_versions, package.other_versions, key=attrgetter("key"))
+    package.rendered = f"{lua_key(package.name)} = " + _block([
+        f"{lua_key(version.name)} = " + _block([
+            _block([f"arch = {lua_string(arch)}"], 3) for arch in sorted(version.arch)
+        ], 2)
+        for version in versions
+    ], 1)
+    return package.rendered
+
+
+def render_manifest(manifest) -> str:
+    return "\n".join((
+        f"commands = {render_value(manifest.commands)}",
+        f"modules = {render_value(manifest.modules)}",
+        f"repository = {_block([render_package(package) for package in manifest.packages], 0)}",
+        "",
+    ))
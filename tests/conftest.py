@@ -0,0 +1,24 @@
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from rocks.manifest import Manifest
+
+
+@pytest.fixture
+def repository(tmp_path) -> Callable[[dict[str, str]], Path]:
+    def make(rockspecs: dict[str, str]) -> Path:
+        directory = tmp_path / "repository"
+        directory.mkdir()
+        man = Manifest(commands={}, modules={}, packages=[])
+        for name, dependencies in rockspecs.items():
+            package, version = name.split("-", 1)
+            man.add_version(package, version, ["rockspec", "src"])
+            (directory / f"{name}.rockspec").write_text(
+                f'package = "{package}"\nversion = "{version}"\ndependencies = {dependencies}\n')
+            (directory / f"{name}.src.rock").write_bytes(b"")
+        (directory / "manifest").write_text(man.to_lua_str())
+        return directory
+
+    return make
@@ -0,0 +1,61 @@
+import http
+
+import pytest
+
+from rocks.backend import LocalBackend, backend_for, content_tag
+from rocks.errors import FileLoadError, PublishConflictError
+
+
+@pytest.fixture
+def backend(tmp_path) -> LocalBackend:
+    (tmp_path / "manifest").write_bytes(b"repository = {}\n")
+    (tmp_path / "sub").mkdir()
+    return LocalBackend(str(tmp_path))
+
+
+@pytest.mark.parametrize("directory", [".", "./"])
+def test_relative_directory(backend: LocalBackend, monkeypatch, directory: str):
+    monkeypatch.chdir(backend.directory)
+    assert LocalBackend(directory).fetch("manifest").content == b"repository = {}\n"
+
+
+def test_fetch_and_listing(backend: LocalBackend):
+    assert backend.fetch("manifest").content == b"repository = {}\n"
+    with backend.mapped("manifest") as content:
+        assert bytes(content) == b"repository = {}\n"
+    assert backend.listing() == {"manifest"}
+    assert backend.exists("manifest") and not backend.exists("sub")
+
+    for name in ("missing", "sub"):
+        with pytest.raises(FileLoadError) as error:
+            backend.fetch(name)
+        assert error.value.status_code == http.HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.parametrize("name", ["../manifest", "sub/manifest", "/etc/passwd"])
+def test_refuses_files_outside_of_directory(backend: LocalBackend, name: str):
+    with pytest.raises(FileLoadError, match="outside"):
+        backend.fetch(name)
+
+
+def test_put_swap_delete(backend: LocalBackend):
+    backend.put("a.rockspec", b"a")
+    assert backend.exists("a.rockspec")
+
+    backend.swap("manifest", b"new", content_tag(b"repository = {}\n"))
+    assert backend.fetch("manifest").content == b"new"
+    with pytest.raises(PublishConflictError):
+        backend.swap("manifest", b"newer", content_tag(b"repository = {}\n"))
+    with pytest.raises(PublishConflictError):
+        backend.swap("other", b"x", content_tag(b"x"))
+    backend.swap("other", b"x", None)
+
+    backend.delete("a.rockspec")
+    backend.delete("a.rockspec")
+    assert backend.listing() == {"manifest", "other"}
+
+
+def test_backend_for(tmp_path):
+    assert isinstance(backend_for(str(tmp_path)), LocalBackend)
+    assert backend_for(tmp_path.as_uri()).directory == str(tmp_path)
+    assert not isinstance(backend_for("http://127.0.0.1:1"), LocalBackend)
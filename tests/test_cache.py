@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from benchmarks.standin import serve
+from benchmarks.synthetic import generate_manifest
+from rocks.cache import HttpCache
+from rocks.server import RockServer
+
+
+@pytest.fixture
+def standin(tmp_path):
+    root = tmp_path / "server"
+    root.mkdir()
+    (root / "manifest").write_text(generate_manifest(50))
+    (root / "a-1.0-1.rockspec").write_text('package = "a"\nversion = "1.0-1"\n')
+    with serve(str(root)) as server:
+        yield server
+
+
+def _store(cache: HttpCache, url: str, content: bytes, mtime: float):
+    with cache.receive(url) as file:
+        file.write(content)
+        entry = cache.store_file(url, file, {})
+    os.utime(entry.path, (mtime, mtime))
+    return entry
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = HttpCache(str(tmp_path), max_size=250)
+    first = _store(cache, "http://x/1", b"1" * 100, 1000)
+    second = _store(cache, "http://x/2", b"2" * 100, 2000)
+    third = _store(cache, "http://x/3", b"3" * 100, 3000)
+
+    assert cache.get(first.url) is None
+    assert cache.read(cache.get(second.url)) == b"2" * 100
+    assert cache.read(cache.get(third.url)) == b"3" * 100
+
+
+def test_keeps_entry_larger_than_cache(tmp_path):
+    cache = HttpCache(str(tmp_path), max_size=0)
+    entry = _store(cache, "http://x/big", b"x" * 1000, 1000)
+    with cache.mapped(entry) as content:
+        assert content[:] == b"x" * 1000
+
+
+@pytest.mark.parametrize("max_size", [0, 1024])
+def test_manifest_larger_than_cache(standin, tmp_path, max_size: int):
+    cache = HttpCache(str(tmp_path / "cache"), max_size=max_size)
+    with RockServer(standin.address, cache=cache) as server:
+        assert len(server.get_manifest().packages) == 50
+        assert server.get_raw_file("a-1.0-1.rockspec").startswith(b'package = "a"')
+    assert standin.requests == 2
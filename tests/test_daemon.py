@@ -0,0 +1,58 @@
+import socket
+import threading
+
+import pytest
+
+from rocks.client import DaemonClient
+from rocks.daemon import ManifestDaemon, _UnixServer
+from rocks.errors import DaemonError, QueryError
+
+
+class _BrokenDaemon(ManifestDaemon):
+
+    def status(self) -> dict:
+        return {"status": "ok"}
+
+    def packages(self, package: str = "") -> dict:
+        raise KeyError(package)
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / "daemon.sock")
+
+
+def test_unexpected_error_answers_500(socket_path):
+    logged = []
+    server = _UnixServer(socket_path, _BrokenDaemon(None), logged.append)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        client = DaemonClient.connect(socket_path)
+        assert client is not None
+        with pytest.raises(DaemonError, match="internal error: KeyError"):
+            client.call("packages", package="foo")
+        with pytest.raises(QueryError, match="unknown query"):
+            client.call("missing")
+        assert client.call("status") == {"status": "ok"}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert len(logged) == 1 and "KeyError: 'foo'" in logged[0]
+
+
+def test_dead_daemon_raises_daemon_error(socket_path):
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen()
+    client = DaemonClient(socket_path, timeout=0.1)
+    try:
+        with pytest.raises(DaemonError):
+            client.call("status")
+    finally:
+        listener.close()
+
+    with pytest.raises(DaemonError):
+        client.call("status")
+    assert DaemonClient.connect(socket_path) is None
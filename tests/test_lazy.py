@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+
+from benchmarks.suite import bench_startup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONCURRENT_FIRST_USE = """
+import threading
+from rocks.rockspec import Rockspec
+
+content = 'package = "a"\\nversion = "1.0-1"\\ndependencies = {"lua >= 5.1", "b ~> 1.0"}\\n'
+barrier = threading.Barrier(8)
+errors = []
+
+def parse():
+    barrier.wait()
+    try:
+        Rockspec.from_string(content)
+    except Exception as e:
+        errors.append(repr(e))
+
+threads = [threading.Thread(target=parse) for _ in range(8)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+print(errors)
+"""
+
+
+def test_concurrent_first_use():
+    for _ in range(3):
+        finished = subprocess.run(
+            [sys.executable, "-c", CONCURRENT_FIRST_USE], cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        assert finished.stdout.strip() == "[]"
+
+
+def test_help_does_not_import_heavy_modules():
+    for result in bench_startup(rounds=1):
+        assert result["heavy_modules"] == [], result["params"]["command"]
@@ -0,0 +1,56 @@
+import pytest
+
+from benchmarks.synthetic import generate_manifest
+from rocks.errors import LuaSubsetError, LuaValueError
+from rocks.lua import get_sandbox
+from rocks.luatable import parse_assignments
+from rocks.manifest import Manifest
+
+CASES = [
+    r'x = "\195\169"',
+    r'x = "\xC3\xA9t\xc3\xa9"',
+    r'x = "caf\195\169 \"quoted\" \\ back\tslash\n"',
+    r'x = "\065\066\0670"',
+    'x = "line \\z\n      continued"',
+    "x = 'single \\'quoted\\''",
+    'x = [[\nlong "string" \\n]]',
+    'x = [=[\nlevel ]] one]=]',
+    "x = {1, 2.5, -3, 0x10, 1e3, true, false, nil, 'a'}",
+    'x = {a = {b = {c = "d"}}, ["key with space"] = 1, [10] = "ten"}; y = "é"',
+    "-- comment\nx = {--[[ inline ]] 'a'; 'b';}\n--[=[ long\ncomment ]=]",
+]
+
+
+@pytest.mark.parametrize("content", CASES)
+def test_matches_lua(content: str):
+    scope = parse_assignments(content)
+    assert scope == get_sandbox().evaluate(content, scope)
+
+
+def test_byte_escapes_decode_as_utf8():
+    assert parse_assignments(r'x = "\195\169"') == {"x": "é"}
+
+
+@pytest.mark.parametrize("content", [
+    r'x = "\256"', r'x = "\q"', "x = y", "x = [==[level two]==]", "x = 1 --[==[ level two ]==]",
+    "x = 1 --[[ unterminated",
+])
+def test_outside_of_subset(content: str):
+    with pytest.raises(LuaSubsetError):
+        parse_assignments(content)
+
+
+@pytest.mark.parametrize("content", [
+    rb'commands = {x = "\xff"}',
+    b'commands = {x = "\xff"}',
+    b'commands = {}\nmodules = {}\nrepository = {a = {["1.0-1"] = {{arch = "\xff"}}}}',
+    b'commands = {x = "\xff" .. ""}',
+])
+def test_invalid_utf8_in_manifest(content: bytes):
+    with pytest.raises(LuaValueError, match="not valid utf-8"):
+        Manifest.from_lua_str(content)
+
+
+def test_manifest_matches_lua():
+    content = generate_manifest(300)
+    assert Manifest.from_lua_str(content).to_lua_str() == Manifest.from_lua_runtime(content).to_lua_str()
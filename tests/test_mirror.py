@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from benchmarks.standin import serve
+from rocks.mirror import Mirror
+from rocks.server import RockServer
+
+ROCKSPECS = {
+    "a-1.0-1": "{}",
+    "a-scm-1": "{}",
+}
+
+
+def _change(file_path, content: bytes):
+    file_path.write_bytes(content)
+    stat = os.stat(file_path)
+    os.utime(file_path, (stat.st_atime, stat.st_mtime + 10))
+
+
+@pytest.fixture
+def source(repository):
+    directory = repository(ROCKSPECS)
+    with serve(str(directory)) as standin, RockServer(standin.address) as server:
+        yield directory, standin, server
+
+
+def test_rerun_refreshes_files_changed_in_place(source, tmp_path):
+    directory, standin, server = source
+    destination = tmp_path / "mirror"
+
+    rocks_mirror = Mirror(server, str(destination))
+    result = rocks_mirror.run(rocks_mirror.plan())
+    assert result.published and len(result.fetched) == 4
+    assert sorted(os.listdir(destination)) == sorted(os.listdir(directory))
+
+    _change(directory / "a-scm-1.rockspec", b"-- changed scm\n")
+    _change(directory / "a-1.0-1.rockspec", b"-- changed release\n")
+
+    rocks_mirror = Mirror(server, str(destination))
+    plan = rocks_mirror.plan()
+    assert (plan.fetch, plan.refresh) == ([], ["a-scm-1.rockspec", "a-scm-1.src.rock"])
+    result = rocks_mirror.run(plan)
+    assert (result.fetched, result.unchanged) == (["a-scm-1.rockspec"], ["a-scm-1.src.rock"])
+    assert (destination / "a-scm-1.rockspec").read_bytes() == b"-- changed scm\n"
+    assert (destination / "a-1.0-1.rockspec").read_bytes() != b"-- changed release\n"
+
+    rocks_mirror = Mirror(server, str(destination))
+    result = rocks_mirror.run(rocks_mirror.plan(revalidate=True))
+    assert (result.fetched, len(result.unchanged)) == (["a-1.0-1.rockspec"], 3)
+    assert (destination / "a-1.0-1.rockspec").read_bytes() == b"-- changed release\n"
+
+    requests = standin.requests
+    rocks_mirror = Mirror(server, str(destination))
+    result = rocks_mirror.run(rocks_mirror.plan())
+    assert (result.fetched, len(result.unchanged)) == ([], 2)
+    assert standin.requests == requests + 3
@@ -0,0 +1,23 @@
+import os
+
+from rocks.backend import LocalBackend
+from rocks.manifest import Manifest
+from rocks.publish import Publisher, describe
+
+
+def test_upload_drops_stale_manifest_variants(repository, tmp_path):
+    directory = repository({"a-1.0-1": "{}"})
+    for name in ("manifest-5.1", "manifest-5.1.zip", "manifest-5.4.json"):
+        (directory / name).write_bytes((directory / "manifest").read_bytes())
+
+    rockspec = tmp_path / "b-2.0-1.rockspec"
+    rockspec.write_text('package = "b"\nversion = "2.0-1"\n')
+    result = Publisher(LocalBackend(str(directory))).upload(describe([str(rockspec)]))
+
+    assert (result.transferred, result.failed) == (["b-2.0-1.rockspec"], {})
+    assert sorted(result.dropped) == ["manifest-5.1", "manifest-5.1.zip", "manifest-5.4.json"]
+    assert sorted(os.listdir(directory)) == ["a-1.0-1.rockspec", "a-1.0-1.src.rock", "b-2.0-1.rockspec", "manifest"]
+    assert sorted(os.listdir(tmp_path)) == ["b-2.0-1.rockspec", "repository"]
+
+    man = Manifest.from_lua_str((directory / "manifest").read_bytes())
+    assert [package.name for package in man.packages] == ["a", "b"]
@@ -0,0 +1,93 @@
+from pathlib import Path
+
+import pytest
+
+from rocks.manifest import Manifest
+from rocks.rdeps import RdepsIndex, render, wanted_rockspecs
+from rocks.server import RockServer
+
+ROCKSPECS = {
+    "md5-1.2-1": '{"lua >= 5.1"}',
+    "md5-1.3-1": '{"lua >= 5.1", "base >= 1.0"}',
+    "x-1.0.0-1": "{}",
+    "x-2.1-1": '{"base ~> 2.0"}',
+    "x-scm-1": '{"base"}',
+    "base-2.0-1": "{}",
+}
+
+
+def test_wanted_rockspecs_prefers_latest_release():
+    man = Manifest(commands={}, modules={}, packages=[])
+    for name in ROCKSPECS:
+        man.add_version(*name.split("-", 1), ["rockspec"])
+    man.add_version("y", "3.0-1", ["src"])
+    man.add_version("y", "2.0-1", ["rockspec"])
+
+    assert wanted_rockspecs(man) == {
+        "base-2.0-1.rockspec": ("base", "2.0-1"),
+        "md5-1.3-1.rockspec": ("md5", "1.3-1"),
+        "x-2.1-1.rockspec": ("x", "2.1-1"),
+        "y-2.0-1.rockspec": ("y", "2.0-1"),
+    }
+    assert len(wanted_rockspecs(man, every=True)) == 7
+
+
+def _publish(directory: Path, rockspecs: dict[str, str]):
+    man = Manifest(commands={}, modules={}, packages=[])
+    for name, dependencies in rockspecs.items():
+        package, version = name.split("-", 1)
+        man.add_version(package, version, ["rockspec"])
+        (directory / f"{name}.rockspec").write_text(
+            f'package = "{package}"\nversion = "{version}"\ndependencies = {dependencies}\n')
+    (directory / "manifest").write_text(man.to_lua_str())
+
+
+@pytest.fixture
+def server(repository):
+    with RockServer(str(repository(ROCKSPECS))) as server:
+        yield server
+
+
+def test_incremental_update(server: RockServer, tmp_path):
+    index_path = str(tmp_path / "rdeps.index")
+    index = RdepsIndex.open(index_path)
+    result = index.update(server)
+    assert (result.added, result.removed, result.failed, result.broken) == (3, 0, [], [])
+    assert list(render(index.tree("base"))) == [
+        "\t md5 1.3-1: base >= 1.0 [2.0-1]",
+        "\t x 2.1-1: base ~> 2.0 [2.0-1]",
+    ]
+
+    directory = Path(server.backend.directory)
+    _publish(directory, {**ROCKSPECS, "y-1.0-1": '{"base == 2.0"}'})
+    server.refresh()
+    index = RdepsIndex.open(index_path)
+    result = index.update(server)
+    assert (result.added, result.removed) == (1, 0)
+    assert [node.dependent.package for node in index.tree("base")] == ["md5", "x", "y"]
+
+    rockspecs = dict(ROCKSPECS)
+    del rockspecs["md5-1.3-1"]
+    _publish(directory, rockspecs)
+    server.refresh()
+    result = index.update(server)
+    assert (result.added, result.removed) == (1, 2)
+    assert [node.dependent.version for node in index.tree("base")] == ["2.1-1"]
+
+    result = RdepsIndex.open(index_path).update(server)
+    assert not result.changed
+
+
+def test_scm_rockspecs_are_read_again_when_manifest_changes(server: RockServer):
+    directory = Path(server.backend.directory)
+    _publish(directory, {**ROCKSPECS, "z-scm-1": "{}"})
+    server.refresh()
+    index = RdepsIndex()
+    index.update(server)
+    assert [dependent.package for dependent in index.dependents("base")] == ["md5", "x"]
+
+    _publish(directory, {**ROCKSPECS, "z-scm-1": '{"base >= 2"}', "w-1.0-1": "{}"})
+    server.refresh()
+    result = index.update(server)
+    assert (result.added, result.refreshed, result.removed) == (1, 1, 0)
+    assert [dependent.package for dependent in index.dependents("base")] == ["md5", "x", "z"]
@@ -0,0 +1,66 @@
+import pytest
+
+from rocks.errors import LuaEvalError, RockspecError
+from rocks.rockspec import DepRule, Rockspec, parse_many
+
+GOOD = b'package = "a"\nversion = "1.0-1"\ndependencies = {"lua >= 5.1", "b ~> 1.0"}\n'
+BAD = {
+    "dependencies not a table": b'package = "a"\nversion = "1.0-1"\ndependencies = "lua"\n',
+    "dependency not a string": b'package = "a"\nversion = "1.0-1"\ndependencies = {{"lua"}}\n',
+    "version not a string": b'package = "a"\nversion = 1\n',
+    "no package": b'version = "1.0-1"\n',
+    "build not a table": b'package = "a"\nversion = "1.0-1"\nbuild = true\n',
+    "not utf-8": b'package = "\xff\xfe"\nversion = "1.0-1"\n',
+    "escaped non utf-8": b'package = "a"\nversion = "1.0-1"\nbuild = {x = "\\255"}\n',
+    "self reference": b'package = "a"\nversion = "1.0-1"\nbuild = {}\nbuild.self = build\n',
+    "function value": b'package = "a"\nversion = "1.0-1"\nbuild = {hook = function() end}\n',
+    "function key": b'package = "a"\nversion = "1.0-1"\nsource = {[{}] = 1}\n',
+}
+
+
+def test_from_string():
+    spec = Rockspec.from_string(GOOD)
+    assert (spec.package, spec.version) == ("a", "1.0-1")
+    assert [str(rule) for rule in spec.deps_rules] == ["lua >= 5.1", "b ~> 1.0"]
+    assert Rockspec.from_string(GOOD.decode("utf-8")).package == "a"
+
+
+@pytest.mark.parametrize("content", BAD.values(), ids=BAD.keys())
+def test_invalid_rockspec(content: bytes):
+    with pytest.raises(RockspecError):
+        Rockspec.from_string(content)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parse_many_isolates_errors(workers: int):
+    contents = [GOOD, *BAD.values(), b"package = ", GOOD]
+    results = parse_many(contents, workers)
+
+    assert isinstance(results[0], Rockspec) and isinstance(results[-1], Rockspec)
+    assert all(isinstance(result, RockspecError) for result in results[1:len(BAD) + 1])
+    assert isinstance(results[len(BAD) + 1], LuaEvalError)
+
+
+@pytest.mark.parametrize("rule, expected", [
+    ("a", "a"),
+    ("a >= 1.0", "a >= 1.0"),
+    ("a >= 1.0, < 2.0", "a >= 1.0, < 2.0"),
+    ("a ~> 1.4", "a ~> 1.4"),
+    ("a != 1.0", "a ~= 1.0"),
+    ("a!=1.0", "a ~= 1.0"),
+    ("a 1.0", "a == 1.0"),
+])
+def test_dep_rule(rule: str, expected: str):
+    assert str(DepRule.from_str(rule)) == expected
+
+
+def test_bare_dep_rule_has_no_constraints():
+    assert DepRule.from_str("a").constraints == []
+
+
+def test_invalid_rule_is_kept_on_its_dependency():
+    spec = Rockspec.from_string(b'package = "a"\nversion = "1.0-1"\ndependencies = {"b >= 1.0", "c >>= 2"}\n')
+    valid, invalid = spec.deps_rules
+    assert valid.error is None
+    assert (invalid.name, str(invalid)) == ("c", "c >>= 2")
+    assert invalid.error == "invalid version constraint: >>= 2"
@@ -0,0 +1,50 @@
+import fnmatch
+
+import pytest
+
+from benchmarks.synthetic import package_name
+from rocks.manifest import Manifest
+from rocks.search import SearchIndex, trigrams
+
+NAMES = sorted({package_name(position) for position in range(2000)} | {
+    "http", "http-client", "httpd", "lua-resty-http", "json", "lua-cjson", "dkjson", "jsonschema", "a", "ab",
+})
+INDEX = SearchIndex.from_names(NAMES)
+
+
+@pytest.mark.parametrize("pattern", [
+    "http", "missing", "http*", "*http*", "*json", "lua-*-http", "h?tp*", "[dj]*json*", "*", "a*", "*b", "?",
+    "*-resty-*", "[!l]*json",
+])
+def test_glob_matches_fnmatch(pattern: str):
+    expected = [name for name in NAMES if fnmatch.fnmatchcase(name, pattern)]
+    assert [NAMES[position] for position in INDEX.glob(pattern)] == expected
+
+
+def test_prefix():
+    assert [NAMES[position] for position in INDEX.prefix("http")] == ["http", "http-client", "httpd"]
+
+
+def test_fuzzy_ranks_by_trigram_similarity():
+    query = "cjson"
+    scores = []
+    for position, name in enumerate(NAMES):
+        shared = len(trigrams(query) & trigrams(name))
+        scores.append((shared / len(trigrams(query) | trigrams(name)), -position))
+    expected = [(-position, score) for score, position in sorted(scores, reverse=True)[:5] if score >= 0.3]
+
+    assert INDEX.fuzzy(query, limit=5) == expected
+    assert [NAMES[position] for position, _ in expected] == ["json", "lua-cjson", "dkjson"]
+    assert NAMES[INDEX.fuzzy("htpp-client", limit=1)[0][0]] == "http-client"
+    assert INDEX.fuzzy("zzzzzz") == []
+
+
+def test_manifest_index_follows_changes():
+    man = Manifest(commands={}, modules={}, packages=[])
+    man.add_version("http", "1.0-1")
+    assert [package.name for package in man.find("h*")] == ["http"]
+
+    man.add_version("httpd", "1.0-1")
+    man.remove_version("http", "1.0-1")
+    assert [package.name for package in man.find("h*")] == ["httpd"]
+    assert [package.name for package in man.similar("htpd")] == ["httpd"]
@@ -0,0 +1,110 @@
+import itertools
+
+import pytest
+
+from benchmarks.synthetic import generate_graph
+from rocks.manifest import VersionRange, version_key
+from rocks.rockspec import Rockspec
+from rocks.server import RockServer
+from rocks.solver import (
+    INVALID_ROCKSPEC, INVALID_RULE, NO_VERSION, NOT_FOUND, Solver, requirements_of, root_requirement,
+)
+
+ROCKSPECS = {
+    "a-1.0-1": '{"lua >= 5.1", "c < 2"}',
+    "a-2.0-1": '{"lua >= 5.1", "c >= 2"}',
+    "b-1.0-1": '{"c ~> 1.0"}',
+    "c-1.0-1": "{}",
+    "c-2.0-1": "{}",
+    "d-1.0-1": '{"c >= 3"}',
+    "e-1.0-1": '"c"',
+}
+
+
+@pytest.fixture
+def solver(repository):
+    with RockServer(str(repository(ROCKSPECS))) as server:
+        yield Solver(server, server.get_manifest(), ["lua"])
+
+
+def _solve(solver: Solver, *rules: str):
+    return solver.solve([root_requirement(rule) for rule in rules])
+
+
+def test_picks_newest_compatible_versions(solver: Solver):
+    resolution = _solve(solver, "a")
+    assert {name: version.name for name, version in resolution.versions.items()} == {"a": "2.0-1", "c": "2.0-1"}
+
+    resolution = _solve(solver, "a", "b")
+    assert {name: version.name for name, version in resolution.versions.items()} == {
+        "a": "1.0-1", "b": "1.0-1", "c": "1.0-1",
+    }
+
+    resolution = _solve(solver, "a@1.0-1")
+    assert resolution.versions["c"].name == "1.0-1"
+
+
+def test_explains_conflicts(solver: Solver):
+    assert _solve(solver, "a >= 2", "b").conflict.explain() == [
+        f"c: {NO_VERSION}", "\ta 2.0-1 requires c >= 2", "\tb 1.0-1 requires c ~> 1.0",
+    ]
+
+    conflict = _solve(solver, "d").conflict
+    assert (conflict.package, conflict.reason) == ("c", NO_VERSION)
+    assert [str(requirement) for requirement in conflict.requirements] == ["d 1.0-1 requires c >= 3"]
+
+    conflict = _solve(solver, "a", "missing").conflict
+    assert (conflict.package, conflict.reason) == ("missing", NOT_FOUND)
+
+
+def test_reports_invalid_rules_and_rockspecs(solver: Solver):
+    conflict = _solve(solver, "e").conflict
+    assert conflict.package == "e" and conflict.reason.startswith(f"1.0-1 {INVALID_ROCKSPEC}")
+
+    spec = Rockspec.from_string('package = "app"\nversion = "1.0-1"\ndependencies = {"b", "a >>= 1"}\n')
+    conflict = solver.solve(requirements_of(spec)).conflict
+    assert (conflict.package, conflict.reason) == ("a", f"{INVALID_RULE}: invalid version constraint: >>= 1")
+
+
+def _satisfied(specs: dict, chosen: dict[str, str]) -> bool:
+    pending, seen = ["root"], {"root"}
+    while pending:
+        name = pending.pop()
+        for rule in specs[name, chosen[name]].deps_rules:
+            if rule.name == "lua":
+                continue
+            if version_key(chosen[rule.name]) not in VersionRange.from_rules(rule.constraints):
+                return False
+            if rule.name not in seen:
+                seen.add(rule.name)
+                pending.append(rule.name)
+    return True
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_matches_exhaustive_search(tmp_path, seed: int):
+    files = generate_graph(depth=2, fanout=2, width=3, seed=seed)
+    for name, content in files.items():
+        (tmp_path / name).write_bytes(content)
+    specs = {}
+    for name, content in files.items():
+        if name.endswith(".rockspec"):
+            spec = Rockspec.from_string(content)
+            specs[spec.package, spec.version] = spec
+    versions: dict[str, list[str]] = {}
+    for package, version in specs:
+        versions.setdefault(package, []).append(version)
+    others = sorted(package for package in versions if package != "root")
+
+    with RockServer(str(tmp_path)) as server:
+        solver = Solver(server, server.get_manifest(), ["lua"])
+        for root in versions["root"]:
+            resolution = solver.solve([root_requirement(f"root@{root}")])
+            if resolution.ok:
+                chosen = {name: version.name for name, version in resolution.versions.items()}
+                assert _satisfied(specs, {**dict.fromkeys(others, ""), **chosen})
+            else:
+                assert not any(
+                    _satisfied(specs, {"root": root, **dict(zip(others, combination))})
+                    for combination in itertools.product(*(versions[package] for package in others))
+                ), resolution.conflict.explain()
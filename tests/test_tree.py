@@ -0,0 +1,46 @@
+import pytest
+
+from benchmarks.standin import serve
+from rocks.rockspec import Rockspec
+from rocks.server import RockServer
+from rocks.tree import DepTree, render
+
+ROCKSPECS = {
+    "b-1.0-1": '{"lua >= 5.1"}',
+    "b-2.0-1": '{"lua >= 5.1"}',
+    "c-1.0-1": '"c"',
+    "f-0.0.5-1": '{}',
+}
+
+
+@pytest.fixture
+def server(repository):
+    with RockServer(str(repository(ROCKSPECS))) as server:
+        yield server
+
+
+def test_invalid_rules_and_rockspecs_stay_on_their_node(server: RockServer):
+    spec = Rockspec.from_string('package = "root"\nversion = "1.0-1"\n'
+                                'dependencies = {"lua >= 5.1", "b != 2.0", "c", "d >>= 1", "e", "f"}\n')
+    tree = DepTree(server, server.get_manifest(), ["lua"], "src")
+    assert list(render(tree.resolve(spec), "src")) == [
+        "\t lua >= 5.1 [✓, excluded]",
+        "\t b ~= 2.0 [1.0-1 src: manifest(✓)/file(✓) ]",
+        "\t\t lua >= 5.1 [✓, excluded]",
+        "\t c [1.0-1 x, invalid rockspec: `dependencies` must be a table, got string]",
+        "\t d >>= 1 [x, invalid rule: invalid version constraint: >>= 1]",
+        "\t e [x, not found in manifest]",
+        "\t f [0.0.5 src: manifest(✓)/file(✓) ]",
+    ]
+
+
+def test_transport_errors_are_not_reported_as_missing_files(repository):
+    spec = Rockspec.from_string('package = "root"\nversion = "1.0-1"\ndependencies = {"b", "e"}\n')
+    with serve(str(repository(ROCKSPECS))) as standin, RockServer(standin.address) as server:
+        man = server.get_manifest()
+        standin.shutdown()
+        standin.server_close()
+        lines = list(render(DepTree(server, man, ["lua"], "src").resolve(spec), "src"))
+
+    assert [line.split(": ", 1)[0] for line in lines] == ["\t b [2.0-1 x, error", "\t e [x, not found in manifest]"]
+    assert "Unable to" in lines[0]
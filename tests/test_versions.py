@@ -0,0 +1,100 @@
+import pytest
+
+from rocks.manifest import Package, SemanticVersion, Version, VersionRange, version_from_string, version_key
+from rocks.rockspec import DepRule
+
+VERSIONS = (
+    "0.9-1", "1.0-1", "1.0.5-1", "1.4-1", "1.4.2-1", "1.4.9-1", "1.5-1", "1.9.0-1", "2.0-1", "2.1-3", "5.0.0-1",
+    "scm-1",
+)
+
+
+@pytest.fixture
+def package() -> Package:
+    package = Package("dep")
+    for name in VERSIONS:
+        package.add_version(name, ["rockspec"])
+    return package
+
+
+@pytest.mark.parametrize("operator, version, best, matching", [
+    ("~>", "1.4", "1.4.9-1", ["1.4-1", "1.4.2-1", "1.4.9-1"]),
+    ("~>", "1.0", "1.0.5-1", ["1.0-1", "1.0.5-1"]),
+    ("~>", "1", "1.9.0-1", ["1.0-1", "1.0.5-1", "1.4-1", "1.4.2-1", "1.4.9-1", "1.5-1", "1.9.0-1"]),
+    ("~>", "1.4.2", "1.4.2-1", ["1.4.2-1"]),
+    ("~>", "2", "2.1-3", ["2.0-1", "2.1-3"]),
+    ("~>", "3", None, []),
+    ("==", "1.4", "1.4-1", ["1.4-1"]),
+    ("==", "2.1-3", "2.1-3", ["2.1-3"]),
+    ("==", "2.1-1", None, []),
+    ("=", "scm", "scm-1", ["scm-1"]),
+    (">=", "1.9", "5.0.0-1", ["1.9.0-1", "2.0-1", "2.1-3", "5.0.0-1", "scm-1"]),
+    (">", "5.0.0", "scm-1", ["scm-1"]),
+    ("<", "1.0", "0.9-1", ["0.9-1"]),
+    ("<=", "1.0", "1.0-1", ["0.9-1", "1.0-1"]),
+    ("~=", "5.0.0", "2.1-3", [name for name in VERSIONS if name != "5.0.0-1"]),
+])
+def test_rule(package: Package, operator: str, version: str, best, matching: list[str]):
+    found = package.get_version_by_rule(operator, version)
+    assert (found and found.name) == best
+    assert [found.name for found in package.all_in(VersionRange.from_rule(operator, version))] == matching
+
+
+def test_not_equal_is_an_alias(package: Package):
+    constraints = DepRule.from_str("dep != 1.4, >= 1.0, < 2").constraints
+    assert constraints == [("~=", "1.4"), (">=", "1.0"), ("<", "2")]
+    assert package.get_version_by_rules(constraints).name == "1.9.0-1"
+    assert [found.name for found in package.all_in(VersionRange.from_rules(constraints))] == [
+        "1.0-1", "1.0.5-1", "1.4.2-1", "1.4.9-1", "1.5-1", "1.9.0-1",
+    ]
+
+
+def test_compound_rules(package: Package):
+    rules = [(">=", "1.0"), ("<", "2.0"), ("~=", "1.9.0")]
+    assert package.get_version_by_rules(rules).name == "1.5-1"
+    assert package.get_version_by_rules([("~>", "1.4"), (">", "1.4.9")]) is None
+
+
+@pytest.mark.parametrize("lower, higher", [
+    ("1.0-1", "1.0-2"),
+    ("1.0", "1.0.1"),
+    ("1.0.9", "1.0.10"),
+    ("1.0alpha", "1.0beta"),
+    ("1.0beta", "1.0pre"),
+    ("1.0pre", "1.0rc1"),
+    ("1.0rc1", "1.0rc2"),
+    ("1.0rc2", "1.0"),
+    ("9.9.9", "cvs-1"),
+    ("cvs-1", "scm-1"),
+    ("scm-1", "dev-1"),
+])
+def test_version_order(lower: str, higher: str):
+    assert version_key(lower) < version_key(higher)
+
+
+def test_revision_is_optional_in_rules():
+    assert version_key("1.0-3") in VersionRange.from_rule("==", "1.0")
+    assert version_key("1.0-3") not in VersionRange.from_rule("==", "1.0-2")
+    assert version_key("1.0") == version_key("1.0.0")
+
+
+@pytest.mark.parametrize("bump, expected", [
+    (lambda version: version.bump_major(), "2.0.0"),
+    (lambda version: version.bump_minor(), "1.3.0"),
+    (lambda version: version.bump_patch(), "1.2.4"),
+    (lambda version: version.bump_prerelease(), "1.2.3-2"),
+    (lambda version: version.replace(minor=7), "1.7.3-1"),
+])
+def test_semantic_version_bumps(bump, expected: str):
+    version = SemanticVersion("1.2.3-1", ["src"])
+    bumped = bump(version)
+    assert isinstance(bumped, SemanticVersion)
+    assert (bumped.name, bumped.arch, bumped.key) == (expected, ["src"], version_key(expected))
+    assert bumped > version
+
+
+def test_version_from_string():
+    assert isinstance(version_from_string("1.0"), SemanticVersion)
+    assert version_from_string("0").name == "scm-1"
+    assert version_from_string("scm-1").is_main
+    assert isinstance(version_from_string("1.0beta"), Version) and not version_from_string("1.0beta").is_main
@@ -0,0 +1,51 @@
+import pytest
+
+from benchmarks.synthetic import generate_manifest
+from rocks.lua import get_sandbox
+from rocks.luatable import parse_assignments
+from rocks.manifest import Manifest
+from rocks.writer import render_value
+
+VALUES = [
+    "plain",
+    'quote " and backslash \\ and \\n',
+    "new\nline\r\0001 tab\t",
+    "é ünïcödé ✓",
+    {"end": 1, "not identifier": 2, "_ok9": 3, 10: "ten", 2.5: "float"},
+    {1: "a", 2: "b", 3: {"nested": {"deep": {1: "x", 2: "y"}}}},
+    {"flag": True, "off": False, "count": -3, "ratio": 0.25},
+    {},
+]
+
+
+@pytest.mark.parametrize("value", VALUES)
+def test_render_value_round_trip(value):
+    content = f"x = {render_value(value)}"
+    assert parse_assignments(content) == get_sandbox().evaluate(content, ["x"]) == {"x": value}
+
+
+def test_sequences_render_as_arrays():
+    assert render_value(["a", ("b", "c")]) == render_value({1: "a", 2: {1: "b", 2: "c"}})
+
+
+def test_manifest_round_trip():
+    content = generate_manifest(300)
+    man = Manifest.from_lua_str(content)
+    rendered = man.to_lua_str()
+    assert Manifest.from_lua_runtime(rendered).to_lua_str() == rendered
+    assert Manifest.from_lua_runtime(content).to_lua_str() == rendered
+
+
+def test_patched_manifest_is_rendered_again():
+    man = Manifest.from_lua_str(generate_manifest(20))
+    first = man.packages[0]
+    version = (first.semver_versions or first.other_versions)[0].name
+    man.to_lua_str()
+
+    man.add_arch(first.name, version, "x86_64")
+    man.add_arch("new-package", "scm-1", "rockspec")
+    assert man.remove_arch(man.packages[-1].name, "missing-1", "src") is False
+
+    patched = Manifest.from_lua_str(man.to_lua_str())
+    assert "x86_64" in patched.search(first.name).get_version(version).arch
+    assert patched.search("new-package").get_version("scm-1").arch == ["rockspec"]